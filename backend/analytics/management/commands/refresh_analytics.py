@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from analytics.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает сводки продаж из строк заказов (за период или целиком)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help='Начало периода, YYYY-MM-DD')
+        parser.add_argument('--to', dest='date_to', help='Конец периода включительно, YYYY-MM-DD')
+
+    def handle(self, *args, **options):
+        dates = {}
+        for name in ('date_from', 'date_to'):
+            if options[name]:
+                try:
+                    dates[name] = parse_date(options[name])
+                except ValueError:
+                    dates[name] = None
+                if dates[name] is None:
+                    raise CommandError(f'Некорректная дата: {options[name]}')
+
+        rows = rebuild(**dates)
+        self.stdout.write(self.style.SUCCESS(f'Строк в сводке товаров: {rows}'))
@@ -0,0 +1,42 @@
+from django.db import models
+
+
+class ProductDailySales(models.Model):
+    """
+    Продажи товара за день. Товар и категория хранятся простыми id, чтобы
+    история не пропадала при удалении товара; category_id = 0 - без категории.
+    Категория фиксируется при первой продаже товара за день.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    day = models.DateField('day')
+    product_id = models.BigIntegerField('product_id')
+    category_id = models.BigIntegerField('category_id', default=0)
+    lines = models.IntegerField('lines', default=0)
+    quantity = models.BigIntegerField('quantity', default=0)
+    revenue = models.BigIntegerField('revenue', default=0)
+
+    class Meta:
+        db_table = 'analytics_product_daily'
+        unique_together = ('day', 'product_id')
+        indexes = [
+            models.Index(fields=['product_id', 'day'], name='analytics_product_day_idx'),
+        ]
+
+
+class CategoryDailySales(models.Model):
+    """Продажи категории за день (сумма ProductDailySales по category_id)"""
+
+    id = models.BigAutoField(primary_key=True)
+    day = models.DateField('day')
+    category_id = models.BigIntegerField('category_id', default=0)
+    lines = models.IntegerField('lines', default=0)
+    quantity = models.BigIntegerField('quantity', default=0)
+    revenue = models.BigIntegerField('revenue', default=0)
+
+    class Meta:
+        db_table = 'analytics_category_daily'
+        unique_together = ('day', 'category_id')
+        indexes = [
+            models.Index(fields=['category_id', 'day'], name='analytics_category_day_idx'),
+        ]
@@ -0,0 +1,136 @@
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from backend.cache import invalidate_tags
+from order.models import OrderStatus
+
+# Продажи по строкам заказов, сгруппированные по дню заказа и товару.
+# Отменённые заказы в аналитику не входят (условие добавляет _apply и rebuild).
+SALES_SQL = """
+    SELECT (o.created_at AT TIME ZONE %(tz)s)::date AS day,
+           l.product_id,
+           COALESCE(p.category_id, 0) AS category_id,
+           COUNT(*) AS lines,
+           SUM(l.amount) AS quantity,
+           SUM(l.amount::bigint * l.price) AS revenue
+    FROM "orderedProduct" l
+    JOIN "order" o ON o.id = l.order_id
+    LEFT JOIN product p ON p.id = l.product_id
+    WHERE {condition}
+    GROUP BY 1, 2, 3
+"""
+
+# Прибавляет (sign = 1) или вычитает (sign = -1) продажи из обеих сводок.
+# В сводку категорий изменения попадают по category_id, записанному в сводке
+# товаров, поэтому перенос товара в другую категорию не ломает вычитание.
+# Строки обновляются в порядке ключа, чтобы параллельные заказы не
+# блокировали друг друга крест-накрест.
+APPLY_SQL = """
+    WITH delta AS (
+        {sales}
+    ), products AS (
+        INSERT INTO analytics_product_daily (day, product_id, category_id, lines, quantity, revenue)
+        SELECT day, product_id, category_id,
+               %(sign)s * lines, %(sign)s * quantity, %(sign)s * revenue
+        FROM delta
+        ORDER BY day, product_id
+        ON CONFLICT (day, product_id) DO UPDATE SET
+            lines = analytics_product_daily.lines + EXCLUDED.lines,
+            quantity = analytics_product_daily.quantity + EXCLUDED.quantity,
+            revenue = analytics_product_daily.revenue + EXCLUDED.revenue
+        RETURNING day, product_id, category_id
+    )
+    INSERT INTO analytics_category_daily (day, category_id, lines, quantity, revenue)
+    SELECT products.day, products.category_id,
+           %(sign)s * SUM(delta.lines), %(sign)s * SUM(delta.quantity), %(sign)s * SUM(delta.revenue)
+    FROM delta
+    JOIN products ON products.day = delta.day AND products.product_id = delta.product_id
+    GROUP BY products.day, products.category_id
+    ORDER BY products.day, products.category_id
+    ON CONFLICT (day, category_id) DO UPDATE SET
+        lines = analytics_category_daily.lines + EXCLUDED.lines,
+        quantity = analytics_category_daily.quantity + EXCLUDED.quantity,
+        revenue = analytics_category_daily.revenue + EXCLUDED.revenue
+"""
+
+REBUILD_PRODUCTS_SQL = """
+    INSERT INTO analytics_product_daily (day, product_id, category_id, lines, quantity, revenue)
+    {sales}
+"""
+
+REBUILD_CATEGORIES_SQL = """
+    INSERT INTO analytics_category_daily (day, category_id, lines, quantity, revenue)
+    SELECT day, category_id, SUM(lines), SUM(quantity), SUM(revenue)
+    FROM analytics_product_daily
+    WHERE {condition}
+    GROUP BY day, category_id
+"""
+
+
+def _params(**params):
+    return {'tz': settings.TIME_ZONE, 'cancelled': OrderStatus.CANCELLED.value, **params}
+
+
+def _apply(condition, ids, sign, skip_cancelled):
+    if not ids:
+        return
+    if skip_cancelled:
+        condition = f'o.status <> %(cancelled)s AND {condition}'
+    with connection.cursor() as cursor:
+        cursor.execute(APPLY_SQL.format(sales=SALES_SQL.format(condition=condition)),
+                       _params(ids=list(ids), sign=sign))
+    invalidate_tags('analytics')
+
+
+def apply_orders(order_ids, sign=1, skip_cancelled=True):
+    """
+    Учитывает (sign=1) или исключает (sign=-1) из сводок все строки заказов.
+    skip_cancelled=False - для заказов, которые уже отменены, но ещё учтены
+    в сводках (массовая отмена сначала меняет статус, затем вычитает продажи).
+    """
+    _apply('l.order_id = ANY(%(ids)s)', order_ids, sign, skip_cancelled)
+
+
+def apply_lines(line_ids, sign=1):
+    """Учитывает (sign=1) или исключает (sign=-1) из сводок строки заказов."""
+    _apply('l.id = ANY(%(ids)s)', line_ids, sign, skip_cancelled=True)
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def rebuild(date_from=None, date_to=None):
+    """
+    Пересчитывает сводки за период (включительно; без границ - целиком) из
+    строк заказов. Таблицы сводок блокируются на время пересчёта, поэтому
+    параллельные заказы дождутся его и применят свои изменения после.
+    Месяцы, выгруженные archive_orders, пересчитывать нельзя: их строк
+    заказов в базе нет, и продажи за них обнулятся.
+    Возвращает количество строк сводки товаров.
+    """
+    conditions, params = ['o.status <> %(cancelled)s'], {}
+    day_conditions = ['TRUE']
+    if date_from is not None:
+        conditions.append('o.created_at >= %(start)s')
+        day_conditions.append('day >= %(date_from)s')
+        params.update(start=_day_start(date_from), date_from=date_from)
+    if date_to is not None:
+        conditions.append('o.created_at < %(end)s')
+        day_conditions.append('day <= %(date_to)s')
+        params.update(end=_day_start(date_to + timedelta(days=1)), date_to=date_to)
+    day_condition = ' AND '.join(day_conditions)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('LOCK TABLE analytics_product_daily, analytics_category_daily IN SHARE ROW EXCLUSIVE MODE')
+        cursor.execute(f'DELETE FROM analytics_product_daily WHERE {day_condition}', params)
+        cursor.execute(f'DELETE FROM analytics_category_daily WHERE {day_condition}', params)
+        cursor.execute(REBUILD_PRODUCTS_SQL.format(sales=SALES_SQL.format(condition=' AND '.join(conditions))),
+                       _params(**params))
+        rows = cursor.rowcount
+        cursor.execute(REBUILD_CATEGORIES_SQL.format(condition=day_condition), params)
+        invalidate_tags('analytics')
+    return rows
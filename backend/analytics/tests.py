@@ -0,0 +1,73 @@
+from django.test import TestCase
+import json
+from user.serializers import UserSerializer
+
+from analytics.models import CategoryDailySales, ProductDailySales
+from analytics.rollups import rebuild
+from catalog.models import Category, Product
+from order.models import OrderedProduct
+from storage.models import ProductStorage, Storage
+
+
+class AnalyticsTest(TestCase):
+    def setUp(self):
+        json_user_body = {
+            'email':'user@mail.ru',
+            'name':'username',
+            'password':'pass'
+        }
+        serializer =UserSerializer(data=json_user_body)
+        serializer.is_valid(raise_exception=True)
+        self.user = serializer.save()
+        json_login_body = {
+            'email':'user@mail.ru',
+            'password':'pass'
+        }
+        response = self.client.post('/login/', json.dumps(json_login_body), content_type="application/json")
+        cookies = response.cookies.get('jwt').value
+        self.client.defaults['HTTP_AUTHORIZATION'] = 'Bearer ' + cookies
+
+        storage = Storage.objects.create(name='north', location='Moscow')
+        hats = Category.objects.create(name='hats')
+        self.helmet = Product.objects.create(name='helmet', price=100, category=hats)
+        self.boots = Product.objects.create(name='boots', price=250)
+        ProductStorage.objects.create(storage=storage, product=self.helmet, count_product=10)
+        ProductStorage.objects.create(storage=storage, product=self.boots, count_product=10)
+
+    def snapshot(self):
+        return (sorted(ProductDailySales.objects.values_list('product_id', 'lines', 'quantity', 'revenue')),
+                sorted(CategoryDailySales.objects.values_list('category_id', 'lines', 'quantity', 'revenue')))
+
+    def test_analytics(self):
+        for products in ([{'product':self.helmet.id, 'amount':2}, {'product':self.boots.id}],
+                         [{'product':self.helmet.id}]):
+            json_order = {'user':self.user.id, 'products':products}
+            response = self.client.post('/order/', json.dumps(json_order), content_type="application/json")
+            self.assertEqual(response.status_code,201)
+
+        response = self.client.get('/analytics/', {'group':'product'})
+        self.assertEqual(response.status_code,200)
+        self.assertEqual([(row['name'], row['quantity'], row['revenue']) for row in response.data['results']],
+                         [('helmet', 3, 300), ('boots', 1, 250)])
+
+        response = self.client.get('/analytics/')
+        self.assertEqual(response.data['results'][0]['revenue'], 550)
+        print('analytics get done')
+
+        #incremental updates match a full rebuild
+        line = OrderedProduct.objects.get(product=self.boots)
+        line.amount = 4
+        line.save()
+        order = line.order
+        order.status = 'cancelled'
+        order.save()
+        incremental = self.snapshot()
+        self.assertEqual([row for row in incremental[1] if row[1]], [(self.helmet.category_id, 1, 1, 100)])
+
+        rebuild()
+        self.assertEqual(self.snapshot()[0], [row for row in incremental[0] if row[1]])
+        self.assertEqual(self.snapshot()[1], [row for row in incremental[1] if row[1]])
+
+        response = self.client.get('/analytics/', {'group':'category', 'date_from':'2000-13-01'})
+        self.assertEqual(response.status_code,400)
+        print('analytics rollups done')
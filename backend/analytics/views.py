@@ -0,0 +1,81 @@
+from django.db.models import Sum
+from django.utils.dateparse import parse_date
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from analytics.models import CategoryDailySales, ProductDailySales
+from backend.cache import cache_response
+from backend.pagination import KeysetPagination
+from catalog.models import Category, Product
+
+ANALYTICS_GROUPS = ('day', 'product', 'category')
+TOTALS = {'lines': Sum('lines'), 'quantity': Sum('quantity'), 'revenue': Sum('revenue')}
+
+
+class AnalyticsAPIView(APIView):
+    """Сводки продаж"""
+
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Продажи за период из предрасчитанных сводок: по дням, самые продаваемые "
+                              "товары или категории (по выручке). Отменённые заказы не учитываются",
+        manual_parameters=[
+            openapi.Parameter('group', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=list(ANALYTICS_GROUPS),
+                              description='Группировка (по умолчанию day)'),
+            openapi.Parameter('date_from', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description='Начало периода, YYYY-MM-DD'),
+            openapi.Parameter('date_to', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description='Конец периода включительно, YYYY-MM-DD'),
+            openapi.Parameter('limit', in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description='Количество товаров или категорий'),
+        ]
+    )
+    @cache_response('analytics')
+    def get(self, request):
+        params = request.query_params
+        group = params.get('group', 'day')
+        if group not in ANALYTICS_GROUPS:
+            return Response({'error': 'group должен быть day, product или category'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        period = {}
+        for name, lookup in (('date_from', 'day__gte'), ('date_to', 'day__lte')):
+            if params.get(name):
+                try:
+                    day = parse_date(params[name])
+                except ValueError:
+                    day = None
+                if day is None:
+                    return Response({'error': f'{name} должен быть датой в формате YYYY-MM-DD'},
+                                    status=status.HTTP_400_BAD_REQUEST)
+                period[lookup] = day
+
+        if group == 'day':
+            rows = (CategoryDailySales.objects.filter(**period)
+                    .values('day').annotate(**TOTALS).order_by('day'))
+            return Response({'group': group, 'results': list(rows)})
+
+        limit = KeysetPagination().get_limit(params.get('limit'))
+        if group == 'product':
+            rows = list(ProductDailySales.objects.filter(**period)
+                        .values('product_id').annotate(**TOTALS)
+                        .order_by('-revenue', 'product_id')[:limit])
+            names = dict(Product.objects.filter(id__in=[row['product_id'] for row in rows])
+                         .values_list('id', 'name'))
+            for row in rows:
+                row['name'] = names.get(row['product_id'])
+        else:
+            rows = list(CategoryDailySales.objects.filter(**period)
+                        .values('category_id').annotate(**TOTALS)
+                        .order_by('-revenue', 'category_id')[:limit])
+            names = dict(Category.objects.filter(id__in=[row['category_id'] for row in rows])
+                         .values_list('id', 'name'))
+            for row in rows:
+                # category_id = 0 - товары без категории
+                row['name'] = names.get(row['category_id'])
+        return Response({'group': group, 'results': rows})
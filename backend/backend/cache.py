@@ -0,0 +1,83 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+
+def _tag_key(tag):
+    return f'tag:{tag}'
+
+
+def _new_version():
+    # Версия, не совпадающая с ранее выданными, если ключ тега был вытеснен
+    return int(time.time() * 1000)
+
+
+def get_tag_versions(tags):
+    keys = [_tag_key(tag) for tag in tags]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _new_version(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def _bump_tags(tags):
+    for tag in tags:
+        try:
+            cache.incr(_tag_key(tag))
+        except ValueError:
+            cache.set(_tag_key(tag), _new_version(), timeout=None)
+
+
+def invalidate_tags(*tags):
+    """
+    Сбрасывает закэшированные ответы с указанными тегами, меняя версию тега.
+
+    Версия меняется сразу и ещё раз после коммита транзакции: иначе ответ,
+    прочитанный параллельным запросом до коммита, закэшировался бы под новой
+    версией со старыми данными.
+    """
+    _bump_tags(tags)
+    transaction.on_commit(lambda: _bump_tags(tags))
+
+
+def get_role(request):
+    user = request.user
+    if not user or not user.is_authenticated:
+        return 'anonymous'
+    return 'staff' if user.is_staff else 'user'
+
+
+def response_cache_key(request, tags):
+    versions = get_tag_versions(tags)
+    raw = '|'.join([request.get_full_path(), get_role(request), *map(str, versions)])
+    return 'response:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+def cache_response(*tags, timeout=None):
+    """
+    Кэширует успешные ответы GET-метода APIView по пути, query-строке
+    и роли пользователя. Ответ сбрасывается через invalidate_tags(<тег>).
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            key = response_cache_key(request, tags)
+            cached = cache.get(key)
+            if cached is not None:
+                return Response(cached)
+
+            response = method(self, request, *args, **kwargs)
+            if isinstance(response, Response) and response.status_code == 200:
+                cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT if timeout is None else timeout)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,41 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+
+def table_version(model):
+    """Дешёвая версия таблицы: количество строк и время последнего изменения."""
+    version = model.objects.aggregate(count=Count('pk'), last=Max('updated_at'))
+    last = version['last'].timestamp() if version['last'] else 0
+    return f"{model._meta.db_table}:{version['count']}:{last}"
+
+
+def list_etag(*models):
+    """
+    ETag списка, который меняется при любом создании, изменении или удалении
+    строк перечисленных моделей. Last-Modified для списков не отдаётся:
+    удаление строки не меняет max(updated_at).
+    """
+    def etag_func(request, *args, **kwargs):
+        versions = '|'.join(table_version(model) for model in models)
+        return hashlib.md5(versions.encode()).hexdigest()
+
+    return method_decorator(condition(etag_func=etag_func))
+
+
+def detail_etag(model):
+    """ETag и Last-Modified отдельной строки по её updated_at (один запрос на оба заголовка)."""
+    def last_modified_func(request, pk, *args, **kwargs):
+        if not hasattr(request, '_row_updated_at'):
+            request._row_updated_at = model.objects.filter(pk=pk).values_list('updated_at', flat=True).first()
+        return request._row_updated_at
+
+    def etag_func(request, pk, *args, **kwargs):
+        updated_at = last_modified_func(request, pk)
+        if updated_at is None:
+            return None
+        return f'{model._meta.db_table}:{pk}:{updated_at.timestamp()}'
+
+    return method_decorator(condition(etag_func=etag_func, last_modified_func=last_modified_func))
@@ -0,0 +1,95 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.db.models.functions import Now
+from PIL import Image, ImageOps
+from rest_framework import serializers
+
+from backend.cache import invalidate_tags
+
+logger = logging.getLogger(__name__)
+
+IMAGE_FORMATS = {
+    'webp': ('WEBP', 'webp'),
+    'jpeg': ('JPEG', 'jpg'),
+}
+
+executor = ThreadPoolExecutor(max_workers=settings.IMAGE_VARIANT_WORKERS, thread_name_prefix='image-variants')
+
+
+def render_variants(name):
+    """
+    Создаёт уменьшенные копии изображения для каждой ширины из
+    IMAGE_VARIANT_WIDTHS в форматах WebP и JPEG.
+
+    return: dict: {'source': имя оригинала, 'webp': {ширина: имя файла}, 'jpeg': {...}}
+    """
+    with default_storage.open(name) as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image.load()
+
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    variants = {'source': name}
+    for key, (image_format, extension) in IMAGE_FORMATS.items():
+        variants[key] = {}
+        for width in settings.IMAGE_VARIANT_WIDTHS:
+            resized = image.copy()
+            if resized.width > width:
+                resized = resized.resize((width, round(resized.height * width / resized.width)), Image.LANCZOS)
+            if image_format == 'JPEG' and resized.mode != 'RGB':
+                resized = resized.convert('RGB')
+
+            buffer = BytesIO()
+            resized.save(buffer, image_format, quality=settings.IMAGE_VARIANT_QUALITY)
+            variant_name = os.path.join(directory, 'variants', f'{stem}_{width}.{extension}')
+            variants[key][str(width)] = default_storage.save(variant_name, ContentFile(buffer.getvalue()))
+    return variants
+
+
+def build_variants(model, pk, name, tag):
+    try:
+        variants = render_variants(name)
+        # Изображение могли заменить, пока строились варианты
+        model.objects.filter(pk=pk, image=name).update(image_variants=variants, updated_at=Now())
+        invalidate_tags(tag)
+    except Exception:
+        logger.exception('Не удалось построить варианты изображения %s', name)
+    finally:
+        connections.close_all()
+
+
+def schedule_variants(instance, tag):
+    """
+    Ставит построение вариантов изображения в фоновый пул после коммита
+    транзакции. Вызывается из post_save моделей с полями image и image_variants.
+    """
+    name = instance.image.name if instance.image else ''
+    if instance.image_variants.get('source', '') == name:
+        return
+    if not name:
+        type(instance).objects.filter(pk=instance.pk).update(image_variants={})
+        return
+
+    model, pk = type(instance), instance.pk
+    transaction.on_commit(lambda: executor.submit(build_variants, model, pk, name, tag))
+
+
+class ImageVariantsField(serializers.Field):
+    """URL вариантов изображения: {'webp': {'64': url, ...}, 'jpeg': {...}}."""
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return {
+            key: {width: default_storage.url(name) for width, name in value.get(key, {}).items()}
+            for key in IMAGE_FORMATS
+        }
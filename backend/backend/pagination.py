@@ -0,0 +1,110 @@
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from drf_yasg import openapi
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+PAGINATION_PARAMETERS = [
+    openapi.Parameter('limit', in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                      description='Размер страницы (включает постраничную выдачу)'),
+    openapi.Parameter('cursor', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                      description='Курсор следующей страницы из поля next'),
+]
+
+
+class KeysetPagination:
+    """
+    Постраничная выдача по ключу (keyset / cursor).
+
+    Вместо OFFSET следующая страница выбирается условием по значениям
+    сортировки последней строки, поэтому страница N стоит столько же, сколько
+    первая. Последнее поле сортировки должно быть уникальным (обычно id).
+
+    Пагинация включается только если в запросе передан `limit` или `cursor`,
+    иначе paginate_queryset возвращает None и view отдаёт полный список.
+    С required=True страница размера PAGINATION_DEFAULT_LIMIT отдаётся всегда.
+    """
+
+    limit_query_param = 'limit'
+    cursor_query_param = 'cursor'
+
+    def __init__(self, ordering=('id',), required=False):
+        self.ordering = tuple(ordering)
+        self.required = required
+        self.default_limit = settings.PAGINATION_DEFAULT_LIMIT
+        self.max_limit = settings.PAGINATION_MAX_LIMIT
+        self.next_cursor = None
+
+    def paginate_queryset(self, queryset, request):
+        params = request.query_params
+        if not self.required and self.limit_query_param not in params and self.cursor_query_param not in params:
+            return None
+
+        limit = self.get_limit(params.get(self.limit_query_param))
+        queryset = queryset.order_by(*self.ordering)
+
+        cursor = params.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(self.get_keyset_filter(self.decode_cursor(cursor)))
+
+        page = list(queryset[:limit + 1])
+        if len(page) > limit:
+            page = page[:limit]
+            self.next_cursor = self.encode_cursor(page[-1])
+        return page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.next_cursor,
+            'results': data,
+        })
+
+    def get_limit(self, value):
+        if value is None:
+            return self.default_limit
+        try:
+            limit = int(value)
+        except ValueError:
+            raise ValidationError({self.limit_query_param: 'Значение должно быть целым числом'})
+        if limit < 1:
+            raise ValidationError({self.limit_query_param: 'Значение должно быть больше нуля'})
+        return min(limit, self.max_limit)
+
+    def get_keyset_filter(self, values):
+        """
+        Строит условие "строка идёт после курсора" для сортировки из нескольких
+        полей: (a > x) OR (a = x AND b > y) OR ...
+        """
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def encode_cursor(self, instance):
+        values = []
+        for field in self.ordering:
+            value = getattr(instance, field.lstrip('-'))
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            values.append(value)
+        payload = json.dumps({'o': self.ordering, 'v': values}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            ordering, values = payload['o'], payload['v']
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            raise ValidationError({self.cursor_query_param: 'Некорректный курсор'})
+
+        if tuple(ordering) != self.ordering or len(values) != len(self.ordering):
+            raise ValidationError({self.cursor_query_param: 'Курсор не соответствует сортировке'})
+        return values
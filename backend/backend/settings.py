@@ -51,6 +51,8 @@ INSTALLED_APPS = [
     'storage',
     'user',
     'order',
+    'generate_desc',
+    'analytics',
     'rest_framework',
     'drf_yasg',
     'django.contrib.postgres',
@@ -79,6 +81,36 @@ REST_FRAMEWORK = {
     ],
 
 }
+PAGINATION_DEFAULT_LIMIT = env.int('PAGINATION_DEFAULT_LIMIT', 50)
+PAGINATION_MAX_LIMIT = env.int('PAGINATION_MAX_LIMIT', 500)
+
+PRODUCT_SEARCH_CONFIG = env('PRODUCT_SEARCH_CONFIG', 'russian')
+PRODUCT_SEARCH_LIMIT = env.int('PRODUCT_SEARCH_LIMIT', 20)
+
+DESCRIPTION_WORKER_BATCH_SIZE = env.int('DESCRIPTION_WORKER_BATCH_SIZE', 40)
+DESCRIPTION_WORKER_CONCURRENCY = env.int('DESCRIPTION_WORKER_CONCURRENCY', 4)
+DESCRIPTION_PROMPT_BATCH_SIZE = env.int('DESCRIPTION_PROMPT_BATCH_SIZE', 5)
+DESCRIPTION_WORKER_POLL_INTERVAL = env.int('DESCRIPTION_WORKER_POLL_INTERVAL', 5)
+DESCRIPTION_LEASE_SECONDS = env.int('DESCRIPTION_LEASE_SECONDS', 300)
+DESCRIPTION_MAX_ATTEMPTS = env.int('DESCRIPTION_MAX_ATTEMPTS', 5)
+DESCRIPTION_RETRY_BASE_DELAY = env.int('DESCRIPTION_RETRY_BASE_DELAY', 30)
+DESCRIPTION_CACHE_SIZE = env.int('DESCRIPTION_CACHE_SIZE', 10000)
+DESCRIPTION_CACHE_TTL = env.int('DESCRIPTION_CACHE_TTL', 300)
+PRODUCT_IMPORT_CHUNK_SIZE = env.int('PRODUCT_IMPORT_CHUNK_SIZE', 1000)
+PRODUCT_IMPORT_MAX_ERRORS = env.int('PRODUCT_IMPORT_MAX_ERRORS', 1000)
+EXPORT_CHUNK_SIZE = env.int('EXPORT_CHUNK_SIZE', 2000)
+STOCK_BULK_MAX_ROWS = env.int('STOCK_BULK_MAX_ROWS', 100000)
+ORDER_STATUS_BULK_MAX_IDS = env.int('ORDER_STATUS_BULK_MAX_IDS', 10000)
+ORDER_PARTITION_AHEAD_MONTHS = env.int('ORDER_PARTITION_AHEAD_MONTHS', 3)
+ORDER_PARTITION_POLL_INTERVAL = env.int('ORDER_PARTITION_POLL_INTERVAL', 86400)
+ORDER_RECENT_MONTHS = env.int('ORDER_RECENT_MONTHS', 12)
+ORDER_ARCHIVE_DIR = env('ORDER_ARCHIVE_DIR', '/vol/archive/orders')
+STOCK_RESERVATION_TTL = env.int('STOCK_RESERVATION_TTL', 900)
+STOCK_RESERVATION_POLL_INTERVAL = env.int('STOCK_RESERVATION_POLL_INTERVAL', 60)
+STORAGE_NEAREST_RADIUS_KM = env.float('STORAGE_NEAREST_RADIUS_KM', 50)
+STORAGE_NEAREST_RADIUS_STEP = env.int('STORAGE_NEAREST_RADIUS_STEP', 4)
+STORAGE_NEAREST_MAX_LIMIT = env.int('STORAGE_NEAREST_MAX_LIMIT', 50)
+
 SWAGGER_SETTINGS = {
     'USE_SESSION_AUTH': False
 }
@@ -170,6 +202,27 @@ DATABASES = {
     }
 }
 
+# Cache
+# Локальная память в разработке, общий Redis в продакшене (REDIS_URL)
+
+REDIS_URL = env('REDIS_URL', None)
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+RESPONSE_CACHE_TIMEOUT = env.int('RESPONSE_CACHE_TIMEOUT', 300)
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -210,6 +263,19 @@ MEDIA_ROOT = '/vol/media/'
 
 MEDIA_URL = 'media/'
 
+STORAGES = {
+    'default': {
+        'BACKEND': 'backend.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+IMAGE_VARIANT_WIDTHS = env.list('IMAGE_VARIANT_WIDTHS', [64, 320, 960], subcast=int)
+IMAGE_VARIANT_QUALITY = env.int('IMAGE_VARIANT_QUALITY', 80)
+IMAGE_VARIANT_WORKERS = env.int('IMAGE_VARIANT_WORKERS', 2)
+
 AUTH_USER_MODEL = 'user.User'
 
 # Default primary key field type
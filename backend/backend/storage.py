@@ -0,0 +1,69 @@
+import hashlib
+import os
+import re
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.core.files.utils import validate_file_name
+from django.utils.deconstruct import deconstructible
+
+HASHED_NAME_RE = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{64}(\.[\w]+)?$')
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранилище, которое называет файлы по SHA-256 содержимого:
+    <каталог upload_to>/<первые 2 символа хэша>/<хэш>.<расширение>.
+
+    Одинаковые загрузки сохраняются на диск один раз, а имя файла никогда не
+    переиспользуется для другого содержимого, поэтому nginx может отдавать
+    такие файлы с Cache-Control: immutable.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        name = self.hashed_name(name, content)
+        validate_file_name(name, allow_relative_path=True)
+        if not self.exists(name):
+            self._write(name, content)
+        return name
+
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return '/'.join(part for part in (directory, digest[:2], digest + extension) if part)
+
+    def _write(self, name, content):
+        # Запись во временный файл и атомарное переименование: параллельная
+        # загрузка того же содержимого просто перезапишет файл тем же самым
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        if self.directory_permissions_mode is not None:
+            old_umask = os.umask(0o777 & ~self.directory_permissions_mode)
+            try:
+                os.makedirs(directory, self.directory_permissions_mode, exist_ok=True)
+            finally:
+                os.umask(old_umask)
+        else:
+            os.makedirs(directory, exist_ok=True)
+
+        with tempfile.NamedTemporaryFile(dir=directory, delete=False) as temporary:
+            for chunk in content.chunks():
+                temporary.write(chunk)
+        os.chmod(temporary.name, self.file_permissions_mode if self.file_permissions_mode is not None else 0o644)
+        os.replace(temporary.name, full_path)
+
+
+def is_hashed_name(name):
+    return bool(HASHED_NAME_RE.search(name))
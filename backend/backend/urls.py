@@ -18,19 +18,28 @@ from django.urls import path
 from django.contrib.staticfiles.urls import staticfiles_urlpatterns
 from django.conf.urls.static import static
 from django.conf import settings
+from rest_framework.routers import SimpleRouter
 
 from authorization.views import RegistrationAPIView, LoginAPIView, LogoutAPIView, ResetPassword, CodeVerification
 from catalog.views import ProductAPIView, ProductListAPIView, ProductAPIViewDetail, CategoryAPIView
-from catalog.views import  CategoryAPIViewDetail, CategoryAPIViewByParent
+from catalog.views import ProductSearchAPIView, ProductImportAPIView, ProductExportAPIView
+from catalog.views import  CategoryAPIViewDetail, CategoryAPIViewByParent, CategoryTreeAPIView
 
-from showcase.views import BannerAPIView, BannerAPIViewDetail
+from showcase.views import BannerAPIView, BannerAPIViewDetail, ShowcaseAPIView
 from storage.views import StorageAPIView, StorageAPIViewDetail, ProductStorageAPIView, ProductStorageAPIViewDetail
-from storage.views import ProductStorageAPIViewByStorage
+from storage.views import ProductStorageAPIViewByStorage, ProductStorageBulkAPIView, ProductStockAPIView
+from storage.views import StorageNearestAPIView
 
 from user.views import UsersAPIView, UserAPIView
-from order.views import OrderAPIView, OrderAPIViewDetail, OrdersUserAPIView
+from generate_desc.views import DescriptionCacheAPIView
+from analytics.views import AnalyticsAPIView
+from order.views import OrderAPIView, OrderAPIViewDetail, OrdersUserAPIView, OrderExportAPIView
+from order.views import OrderReservationAPIView, OrderStatusAPIView, OrderViewSet
 from .yasg import urlpatterns as doc_urls
 
+router = SimpleRouter()
+router.register('orders', OrderViewSet, basename='orders')
+
 
 urlpatterns = [
     path('registration/', RegistrationAPIView.as_view()),
@@ -40,23 +49,37 @@ urlpatterns = [
     path('logout/', LogoutAPIView.as_view()),
     path('product/', ProductAPIView.as_view()),
     path('productList/', ProductListAPIView.as_view()),
+    path('product/search/', ProductSearchAPIView.as_view()),
+    path('product/import/', ProductImportAPIView.as_view()),
+    path('product/export/', ProductExportAPIView.as_view()),
     path('product/<int:pk>/', ProductAPIViewDetail.as_view()),
+    path('product/<int:pk>/stock/', ProductStockAPIView.as_view()),
     path('category/', CategoryAPIView.as_view()),
+    path('category/tree/', CategoryTreeAPIView.as_view()),
     path('category/<int:pk>/', CategoryAPIViewDetail.as_view()),
     path('categoryByParent/<int:pk>/', CategoryAPIViewByParent.as_view()),
     path('banner/', BannerAPIView.as_view()),
     path('banner/<int:pk>/', BannerAPIViewDetail.as_view()),
+    path('showcase/', ShowcaseAPIView.as_view()),
     path('order/', OrderAPIView.as_view()),
+    path('order/export/', OrderExportAPIView.as_view()),
+    path('order/status/', OrderStatusAPIView.as_view()),
     path('order/<int:pk>/', OrderAPIViewDetail.as_view()),
+    path('order/<int:pk>/reservations/', OrderReservationAPIView.as_view()),
     path('ordersUser/<int:fk>/', OrdersUserAPIView.as_view()),
     path('storage/', StorageAPIView.as_view()),
+    path('storage/nearest/', StorageNearestAPIView.as_view()),
     path('storage/<int:pk>', StorageAPIViewDetail.as_view()),
     path('productStorage/', ProductStorageAPIView.as_view()),
+    path('productStorage/bulk/', ProductStorageBulkAPIView.as_view()),
     path('productStorage/<int:pk>/', ProductStorageAPIViewDetail.as_view()),
     path('productStorageByStorage/<int:fk>/', ProductStorageAPIViewByStorage.as_view()),
+    path('descriptionCache/', DescriptionCacheAPIView.as_view()),
+    path('analytics/', AnalyticsAPIView.as_view()),
     path('codeVerification/<str:email>/', CodeVerification.as_view()),
     path('resetPassword/<str:email>/', ResetPassword.as_view()),
 ]
+urlpatterns += router.urls
 urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 urlpatterns += staticfiles_urlpatterns()
 urlpatterns += doc_urls
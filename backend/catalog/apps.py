@@ -0,0 +1,21 @@
+from django.apps import AppConfig
+from django.db import connections
+from django.db.models.signals import post_migrate, pre_migrate
+
+
+def create_extensions(sender, using, **kwargs):
+    """Расширения PostgreSQL, которые нужны индексам каталога."""
+    with connections[using].cursor() as cursor:
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+
+class CatalogConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'catalog'
+
+    def ready(self):
+        from catalog import signals  # noqa: F401
+        from catalog.tree import install_tree_paths
+
+        pre_migrate.connect(create_extensions, sender=self)
+        post_migrate.connect(install_tree_paths, sender=self)
@@ -0,0 +1,90 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from backend.cache import invalidate_tags
+from catalog.models import DescriptionStatus, Product
+from catalog.search import update_search_vectors
+from generate_desc.cache import generate_descriptions_cached
+
+
+def pending_description_fields():
+    """Поля товара, которые ставят генерацию описания в очередь."""
+    return {
+        'description_status': DescriptionStatus.PENDING,
+        'description_attempts': 0,
+        'description_retry_at': timezone.now(),
+    }
+
+
+def claim_products(batch_size):
+    """
+    Забирает из очереди товары, ожидающие генерации описания.
+
+    Строки блокируются с SKIP LOCKED, поэтому несколько воркеров не получат
+    один и тот же товар. Вместо удержания блокировки на время запроса к модели
+    retry_at сдвигается на DESCRIPTION_LEASE_SECONDS: если воркер упадёт,
+    товар вернётся в очередь после истечения аренды.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            Product.objects
+            .select_for_update(skip_locked=True)
+            .filter(description_status=DescriptionStatus.PENDING, description_retry_at__lte=now)
+            .order_by('description_retry_at')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        Product.objects.filter(id__in=ids).update(
+            description_retry_at=now + timedelta(seconds=settings.DESCRIPTION_LEASE_SECONDS)
+        )
+    return list(Product.objects.filter(id__in=ids).only('id', 'name', 'description_attempts'))
+
+
+def complete_description(product, description):
+    updated = Product.objects.filter(pk=product.pk, description_status=DescriptionStatus.PENDING).update(
+        description=description,
+        description_status=DescriptionStatus.DONE,
+        description_retry_at=None,
+        updated_at=timezone.now(),
+    )
+    if updated:
+        update_search_vectors(Product.objects.filter(pk=product.pk))
+    return updated
+
+
+def fail_description(product):
+    """Планирует повтор с экспоненциальной задержкой или помечает товар как failed."""
+    attempts = product.description_attempts + 1
+    if attempts >= settings.DESCRIPTION_MAX_ATTEMPTS:
+        fields = {'description_status': DescriptionStatus.FAILED, 'description_retry_at': None}
+    else:
+        delay = settings.DESCRIPTION_RETRY_BASE_DELAY * 2 ** (attempts - 1)
+        fields = {'description_retry_at': timezone.now() + timedelta(seconds=delay)}
+    return Product.objects.filter(pk=product.pk, description_status=DescriptionStatus.PENDING).update(
+        description_attempts=attempts, updated_at=timezone.now(), **fields
+    )
+
+
+def process_batch(batch_size):
+    """
+    Обрабатывает одну пачку очереди: описания берутся из кэша или генерируются параллельно
+    (DESCRIPTION_WORKER_CONCURRENCY потоков, до DESCRIPTION_PROMPT_BATCH_SIZE
+    товаров в одном запросе к модели). Возвращает количество взятых товаров.
+    """
+    products = claim_products(batch_size)
+    if not products:
+        return 0
+
+    descriptions = generate_descriptions_cached([product.name for product in products],
+                                                max_workers=settings.DESCRIPTION_WORKER_CONCURRENCY,
+                                                batch_size=settings.DESCRIPTION_PROMPT_BATCH_SIZE)
+    for product, description in zip(products, descriptions):
+        if description:
+            complete_description(product, description)
+        else:
+            fail_description(product)
+    invalidate_tags('product')
+    return len(products)
@@ -0,0 +1,111 @@
+from django.db.models import Subquery
+from drf_yasg import openapi
+from rest_framework.exceptions import ValidationError
+
+from catalog.models import Category
+
+PRODUCT_ORDERINGS = {
+    'sorder_order': ('sorder_order', 'id'),
+    '-sorder_order': ('-sorder_order', '-id'),
+    'price': ('price', 'id'),
+    '-price': ('-price', '-id'),
+    'rating': ('rating', 'id'),
+    '-rating': ('-rating', '-id'),
+}
+
+PRODUCT_FILTER_PARAMETERS = [
+    openapi.Parameter('name', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                      description='Часть названия товара'),
+    openapi.Parameter('brand', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                      description='Название бренда товара'),
+    openapi.Parameter('category', in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                      description='id категории к которой относится товар'),
+    openapi.Parameter('category_subtree', in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                      description='id категории: товары этой категории и всех её подкатегорий'),
+    openapi.Parameter('price_min', in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                      description='Минимальная цена товара'),
+    openapi.Parameter('price_max', in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                      description='Максимальная цена товара'),
+    openapi.Parameter('rating_min', in_=openapi.IN_QUERY, type=openapi.TYPE_NUMBER,
+                      description='Минимальный рейтинг товара'),
+    openapi.Parameter('rating_max', in_=openapi.IN_QUERY, type=openapi.TYPE_NUMBER,
+                      description='Максимальный рейтинг товара'),
+    openapi.Parameter('in_stock', in_=openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN,
+                      description='Только товары в наличии'),
+    openapi.Parameter('ordering', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                      enum=list(PRODUCT_ORDERINGS),
+                      description='Сортировка (по умолчанию sorder_order)'),
+]
+
+
+def _parse(params, name, cast):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return cast(value)
+    except ValueError:
+        raise ValidationError({name: 'Некорректное значение'})
+
+
+def _parse_bool(value):
+    if value.lower() in ('1', 'true', 'yes'):
+        return True
+    if value.lower() in ('0', 'false', 'no'):
+        return False
+    raise ValueError(value)
+
+
+def filter_products(queryset, params):
+    """
+    Применяет фильтры каталога из query-параметров запроса.
+    Все условия выполняются в SQL и опираются на индексы модели Product.
+    """
+    name = params.get('name')
+    if name:
+        queryset = queryset.filter(name__icontains=name)
+
+    brand = params.get('brand')
+    if brand:
+        queryset = queryset.filter(brand=brand)
+
+    category = _parse(params, 'category', int)
+    if category is not None:
+        queryset = queryset.filter(category_id=category)
+
+    category_subtree = _parse(params, 'category_subtree', int)
+    if category_subtree is not None:
+        # path потомков начинается с path категории-предка. Path корня берётся
+        # подзапросом в том же запросе; для несуществующей категории он NULL
+        # и условие не выполняется ни для одного товара
+        root_path = Category.objects.filter(pk=category_subtree).values('path')[:1]
+        queryset = queryset.filter(category__path__startswith=Subquery(root_path))
+
+    price_min = _parse(params, 'price_min', int)
+    if price_min is not None:
+        queryset = queryset.filter(price__gte=price_min)
+
+    price_max = _parse(params, 'price_max', int)
+    if price_max is not None:
+        queryset = queryset.filter(price__lte=price_max)
+
+    rating_min = _parse(params, 'rating_min', float)
+    if rating_min is not None:
+        queryset = queryset.filter(rating__gte=rating_min)
+
+    rating_max = _parse(params, 'rating_max', float)
+    if rating_max is not None:
+        queryset = queryset.filter(rating__lte=rating_max)
+
+    in_stock = _parse(params, 'in_stock', _parse_bool)
+    if in_stock is not None:
+        queryset = queryset.filter(count__gt=0) if in_stock else queryset.filter(count__lte=0)
+
+    return queryset
+
+
+def get_product_ordering(params):
+    ordering = params.get('ordering') or 'sorder_order'
+    if ordering not in PRODUCT_ORDERINGS:
+        raise ValidationError({'ordering': 'Допустимые значения: ' + ', '.join(PRODUCT_ORDERINGS)})
+    return PRODUCT_ORDERINGS[ordering]
@@ -0,0 +1,182 @@
+import csv
+import json
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework import serializers
+
+from backend.cache import invalidate_tags
+from catalog.descriptions import pending_description_fields
+from catalog.models import Category, DescriptionStatus, Product
+from catalog.search import update_search_vectors
+
+# Столбцы, которые upsert перезаписывает, если они есть в строке файла
+UPSERT_FIELDS = ['brand', 'category', 'price', 'description', 'rating', 'sorder_order']
+DESCRIPTION_FIELDS = ['description_status', 'description_attempts', 'description_retry_at']
+
+
+class ProductImportSerializer(serializers.Serializer):
+    """
+    Проверка строки импорта без обращений к базе: уникальность названий и
+    существование категорий проверяются для всей пачки двумя запросами.
+    """
+    name = serializers.CharField(max_length=255)
+    brand = serializers.CharField(max_length=255, allow_blank=True, default='')
+    category = serializers.IntegerField(allow_null=True, default=None)
+    price = serializers.IntegerField(default=1)
+    description = serializers.CharField(allow_blank=True, default='')
+    rating = serializers.FloatField(default=5)
+    sorder_order = serializers.IntegerField(default=1)
+
+
+def iter_lines(stream):
+    """Построчное чтение тела запроса без загрузки его в память целиком."""
+    if stream is None:
+        return
+    for number, line in enumerate(iter(stream.readline, b'')):
+        line = line.decode('utf-8')
+        yield line.lstrip('\ufeff') if number == 0 else line
+
+
+def iter_ndjson(lines):
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield number, None, {'non_field_errors': ['Некорректный JSON']}
+            continue
+        if not isinstance(row, dict):
+            yield number, None, {'non_field_errors': ['Строка должна быть JSON-объектом']}
+            continue
+        yield number, row, None
+
+
+def iter_csv(lines):
+    for number, row in enumerate(csv.DictReader(lines), start=1):
+        # Пустые ячейки означают значение по умолчанию (в upsert - без изменений)
+        yield number, {key: value for key, value in row.items() if key and value not in ('', None)}, None
+
+
+class ProductImport:
+    """Потоковый импорт товаров пачками с записью через bulk_create."""
+
+    def __init__(self, upsert=False):
+        self.upsert = upsert
+        self.chunk_size = settings.PRODUCT_IMPORT_CHUNK_SIZE
+        self.max_errors = settings.PRODUCT_IMPORT_MAX_ERRORS
+        self.processed = 0
+        self.written = 0
+        self.errors = []
+        self.errors_truncated = False
+
+    def run(self, rows):
+        chunk = []
+        for number, row, error in rows:
+            self.processed += 1
+            if error:
+                self.add_error(number, error)
+                continue
+            chunk.append((number, row))
+            if len(chunk) >= self.chunk_size:
+                self.write_chunk(chunk)
+                chunk = []
+        if chunk:
+            self.write_chunk(chunk)
+        return self.report()
+
+    def add_error(self, number, errors):
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'row': number, 'errors': errors})
+        else:
+            self.errors_truncated = True
+
+    def validate_chunk(self, chunk):
+        valid = {}
+        for number, row in chunk:
+            # В upsert отсутствующие в строке столбцы не получают значений по
+            # умолчанию, чтобы не затереть ими существующий товар
+            serializer = ProductImportSerializer(data=row, partial=self.upsert)
+            if not serializer.is_valid():
+                self.add_error(number, serializer.errors)
+            elif 'name' not in serializer.validated_data:
+                self.add_error(number, {'name': ['Обязательное поле.']})
+            elif serializer.validated_data['name'] in valid:
+                self.add_error(number, {'name': ['Название повторяется в файле']})
+            else:
+                valid[serializer.validated_data['name']] = (number, serializer.validated_data)
+
+        category_ids = {data['category'] for _, data in valid.values() if data.get('category') is not None}
+        categories = set(Category.objects.filter(id__in=category_ids).values_list('id', flat=True))
+        existing = set()
+        if not self.upsert:
+            existing = set(Product.objects.filter(name__in=list(valid)).values_list('name', flat=True))
+
+        products = []
+        for name, (number, data) in valid.items():
+            if data.get('category') is not None and data['category'] not in categories:
+                self.add_error(number, {'category': ['Категория не найдена']})
+            elif name in existing:
+                self.add_error(number, {'name': ['Товар с таким названием уже существует']})
+            elif self.upsert:
+                product = self.build_product(data)
+                products.append((product, self.get_update_fields(product, data)))
+            else:
+                products.append(self.build_product(data))
+        return products
+
+    def build_product(self, data):
+        """Новый товар: столбцы, которых нет в data, получают значения по умолчанию модели."""
+        product = Product(name=data['name'], description_status=DescriptionStatus.DONE)
+        for field in UPSERT_FIELDS:
+            if field in data:
+                setattr(product, 'category_id' if field == 'category' else field, data[field])
+        if not product.description:
+            for field, value in pending_description_fields().items():
+                setattr(product, field, value)
+        return product
+
+    @staticmethod
+    def get_update_fields(product, data):
+        """
+        Столбцы, которые upsert обновит у существующего товара: только
+        переданные в строке. Пустое описание не затирает сохранённое.
+        """
+        fields = [field for field in UPSERT_FIELDS if field in data]
+        if 'description' in fields:
+            if product.description:
+                fields += DESCRIPTION_FIELDS
+            else:
+                fields.remove('description')
+        return tuple(fields) + ('updated_at',)
+
+    def write_chunk(self, chunk):
+        products = self.validate_chunk(chunk)
+        if not products:
+            return
+        with transaction.atomic():
+            if self.upsert:
+                # ON CONFLICT DO UPDATE обновляет одинаковый набор столбцов,
+                # поэтому строки группируются по набору переданных столбцов
+                groups = {}
+                for product, fields in products:
+                    groups.setdefault(fields, []).append(product)
+                for fields, group in groups.items():
+                    Product.objects.bulk_create(group, update_conflicts=True,
+                                                unique_fields=['name'], update_fields=list(fields))
+                products = [product for product, _ in products]
+            else:
+                Product.objects.bulk_create(products)
+            update_search_vectors(Product.objects.filter(name__in=[product.name for product in products]))
+            invalidate_tags('product')
+        self.written += len(products)
+
+    def report(self):
+        return {
+            'processed': self.processed,
+            'written': self.written,
+            'errors': self.errors,
+            'errors_truncated': self.errors_truncated,
+        }
@@ -0,0 +1,34 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from backend.storage import is_hashed_name
+from catalog.models import Category, Product
+from showcase.models import Banner
+
+
+class Command(BaseCommand):
+    help = 'Переименовывает ранее загруженные изображения по хэшу содержимого, удаляя дубликаты'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete-originals', action='store_true',
+                            help='Удалить старые файлы после переименования')
+
+    def handle(self, *args, **options):
+        originals = set()
+        for model in (Product, Category, Banner):
+            renamed = 0
+            for instance in model.objects.exclude(image='').only('id', 'image').iterator():
+                name = instance.image.name
+                if not name or is_hashed_name(name) or not default_storage.exists(name):
+                    continue
+                with default_storage.open(name) as file:
+                    hashed = default_storage.save(name, file)
+                model.objects.filter(pk=instance.pk).update(image=hashed)
+                originals.add(name)
+                renamed += 1
+            self.stdout.write(f'{model.__name__}: переименовано изображений {renamed}')
+
+        if options['delete_originals']:
+            for name in originals:
+                default_storage.delete(name)
+            self.stdout.write(f'Удалено файлов: {len(originals)}')
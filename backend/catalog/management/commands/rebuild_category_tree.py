@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from catalog.tree import rebuild_tree
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает materialized path дерева категорий'
+
+    def handle(self, *args, **options):
+        updated = rebuild_tree()
+        self.stdout.write(self.style.SUCCESS(f'Обновлено категорий: {updated}'))
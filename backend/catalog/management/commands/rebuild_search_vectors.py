@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from catalog.models import Product
+from catalog.search import update_search_vectors
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает поисковые векторы товаров'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Пересчитать все товары, а не только без вектора')
+
+    def handle(self, *args, **options):
+        products = Product.objects.all()
+        if not options['all']:
+            products = products.filter(search_vector__isnull=True)
+        updated = update_search_vectors(products)
+        self.stdout.write(self.style.SUCCESS(f'Обновлено товаров: {updated}'))
@@ -0,0 +1,26 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from catalog.descriptions import process_batch
+from generate_desc.cache import stats
+
+
+class Command(BaseCommand):
+    help = 'Фоновая генерация описаний товаров из очереди в базе данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Обработать очередь до конца и завершиться')
+        parser.add_argument('--batch-size', type=int, default=settings.DESCRIPTION_WORKER_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        while True:
+            processed = process_batch(options['batch_size'])
+            if processed:
+                self.stdout.write(f'Обработано товаров: {processed}, кэш описаний: {stats.as_dict()}')
+                continue
+            if options['once']:
+                break
+            time.sleep(settings.DESCRIPTION_WORKER_POLL_INTERVAL)
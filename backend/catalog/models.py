@@ -1,4 +1,7 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.utils import timezone
 
 
 class Category(models.Model):
@@ -7,9 +10,24 @@ class Category(models.Model):
     parent = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True)
     sorder_order = models.IntegerField('sorder_order', default=1)
     image = models.ImageField(upload_to='category_image/', blank=True)
+    image_variants = models.JSONField('image_variants', default=dict, editable=False)
+    path = models.CharField('path', max_length=255, default='', editable=False)
+    depth = models.IntegerField('depth', default=0, editable=False)
+    created_at = models.DateTimeField('created_at', default=timezone.now, editable=False)
+    updated_at = models.DateTimeField('updated_at', auto_now=True, db_index=True)
 
     class Meta:
         db_table = 'category'
+        indexes = [
+            # varchar_pattern_ops обслуживает LIKE 'prefix%' (поддерево по path)
+            models.Index(fields=['path'], name='category_path_idx', opclasses=['varchar_pattern_ops']),
+        ]
+
+
+class DescriptionStatus(models.TextChoices):
+    PENDING = 'pending'
+    DONE = 'done'
+    FAILED = 'failed'
 
 
 class Product(models.Model):
@@ -23,6 +41,25 @@ class Product(models.Model):
     rating = models.FloatField('rating', default=5)
     sorder_order = models.IntegerField('sorder_order', default=1)
     image = models.ImageField(upload_to='product_image/', blank=True)
+    image_variants = models.JSONField('image_variants', default=dict, editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+    description_status = models.CharField('description_status', max_length=16,
+                                          choices=DescriptionStatus.choices, default=DescriptionStatus.DONE)
+    description_attempts = models.IntegerField('description_attempts', default=0)
+    description_retry_at = models.DateTimeField('description_retry_at', null=True, blank=True)
+    created_at = models.DateTimeField('created_at', default=timezone.now, editable=False)
+    updated_at = models.DateTimeField('updated_at', auto_now=True, db_index=True)
 
     class Meta:
         db_table = 'product'
+        indexes = [
+            models.Index(fields=['sorder_order', 'id'], name='product_sorder_idx'),
+            models.Index(fields=['category', 'sorder_order', 'id'], name='product_category_sorder_idx'),
+            models.Index(fields=['brand', 'sorder_order', 'id'], name='product_brand_sorder_idx'),
+            models.Index(fields=['price', 'id'], name='product_price_idx'),
+            models.Index(fields=['rating', 'id'], name='product_rating_idx'),
+            GinIndex(fields=['search_vector'], name='product_search_idx'),
+            GinIndex(fields=['name'], name='product_name_trgm_idx', opclasses=['gin_trgm_ops']),
+            models.Index(fields=['description_retry_at'], name='product_description_queue_idx',
+                         condition=models.Q(description_status=DescriptionStatus.PENDING)),
+        ]
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db.models import F
+
+from catalog.models import Product
+
+SEARCH_FIELDS = ('name', 'brand', 'description')
+
+
+def product_search_vector():
+    """Выражение для хранимого поля Product.search_vector."""
+    config = settings.PRODUCT_SEARCH_CONFIG
+    return (SearchVector('name', weight='A', config=config)
+            + SearchVector('brand', weight='B', config=config)
+            + SearchVector('description', weight='C', config=config))
+
+
+def update_search_vectors(queryset):
+    """Пересчитывает search_vector одним UPDATE для всех товаров queryset."""
+    return queryset.update(search_vector=product_search_vector())
+
+
+def search_products(query, limit):
+    """
+    Полнотекстовый поиск по name/brand/description с ранжированием.
+    Если ничего не найдено (например, в запросе опечатка), выполняется
+    поиск по триграммному сходству названия.
+
+    return: (list[Product], str): найденные товары и режим поиска.
+    """
+    search_query = SearchQuery(query, config=settings.PRODUCT_SEARCH_CONFIG, search_type='websearch')
+    products = list(
+        Product.objects
+        .filter(search_vector=search_query)
+        .annotate(rank=SearchRank(F('search_vector'), search_query))
+        .order_by('-rank', 'id')[:limit]
+    )
+    if products:
+        return products, 'fulltext'
+
+    products = list(
+        Product.objects
+        .filter(name__trigram_similar=query)
+        .annotate(similarity=TrigramSimilarity('name', query))
+        .order_by('-similarity', 'id')[:limit]
+    )
+    return products, 'trigram'
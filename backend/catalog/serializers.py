@@ -1,24 +1,61 @@
 from rest_framework import serializers
 
-from generate_desc.generate_description import generate_product_description
-from .models import Category, Product
+from backend.images import ImageVariantsField
+from .models import Category, DescriptionStatus, Product
+from .descriptions import pending_description_fields
+from .tree import is_descendant
+
+PRODUCT_SUMMARY_FIELDS = ('id', 'name', 'brand', 'price', 'rating', 'count', 'image', 'image_variants')
 
 
 class CategorySerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Category
         fields = '__all__'
 
+    def validate_parent(self, parent):
+        if self.instance is not None and is_descendant(self.instance, parent):
+            raise serializers.ValidationError('Категория не может быть вложена в собственную подкатегорию')
+        return parent
+
+
+class ProductSummarySerializer(serializers.ModelSerializer):
+    """Краткая карточка товара для вложения в баннеры и витрину"""
+
+    image_variants = ImageVariantsField()
+
+    class Meta:
+        model = Product
+        fields = PRODUCT_SUMMARY_FIELDS
+
 
 class ProductSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Product
 
-        fields = '__all__'
+        exclude = ('search_vector',)
+        # count - сумма остатков по складам, её поддерживает триггер product_storage
+        read_only_fields = ('count', 'description_status', 'description_attempts', 'description_retry_at')
+
+    @staticmethod
+    def set_description_status(validated_data):
+        description = validated_data.get('description', None)
+        name = validated_data.get('name', None)
+        if description:
+            validated_data['description_status'] = DescriptionStatus.DONE
+        elif name:
+            # Описание сгенерирует фоновый воркер (run_description_worker)
+            validated_data.update(pending_description_fields())
+        return validated_data
+
+    # create/update, а не save: при many=True ListSerializer.save вызывает
+    # create дочернего сериализатора, минуя его save
+    def create(self, validated_data):
+        return super().create(self.set_description_status(validated_data))
 
-    def save(self, **kwargs):
-        description = self.validated_data.get('description', None)
-        name = self.validated_data.get('name', None)
-        if not description and name:
-            self.validated_data['description'] = generate_product_description(name)
-        return super().save(**kwargs)
+    def update(self, instance, validated_data):
+        return super().update(instance, self.set_description_status(validated_data))
@@ -0,0 +1,92 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.db.models.functions import Now
+from django.dispatch import receiver
+
+from backend.cache import invalidate_tags
+from backend.images import schedule_variants
+from catalog.models import Category, Product
+from catalog.search import SEARCH_FIELDS, update_search_vectors
+from catalog.tree import get_node_path, move_subtree, rebuild_tree
+
+
+@receiver(post_save, sender=Product)
+def product_search_vector(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not set(SEARCH_FIELDS) & set(update_fields):
+        return
+    update_search_vectors(Product.objects.filter(pk=instance.pk))
+
+
+@receiver(pre_save, sender=Category)
+def category_remember_node(sender, instance, update_fields=None, **kwargs):
+    instance._old_node = None
+    if instance.pk is None or (update_fields is not None and 'parent' not in update_fields):
+        return
+
+    instance._old_node = Category.objects.filter(pk=instance.pk).values_list('path', 'depth').first()
+    if instance._old_node and instance._old_node[0]:
+        parent_path, _ = get_node_path(instance.parent_id)
+        if parent_path.startswith(instance._old_node[0]):
+            raise ValueError('Категория не может быть вложена в собственную подкатегорию')
+
+
+@receiver(post_save, sender=Category)
+def category_update_path(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'parent' not in update_fields:
+        return
+
+    old_node = getattr(instance, '_old_node', None)
+    if old_node and not old_node[0]:
+        # У категории и её поддерева ещё нет path: пересчитывается всё дерево
+        rebuild_tree()
+        instance.path, instance.depth = Category.objects.filter(pk=instance.pk).values_list('path', 'depth').get()
+        return
+
+    parent_path, parent_depth = get_node_path(instance.parent_id)
+    path, depth = f'{parent_path}{instance.pk}/', parent_depth + 1
+
+    if old_node and old_node[0]:
+        if old_node != (path, depth):
+            move_subtree(old_node[0], path, depth - old_node[1])
+    else:
+        Category.objects.filter(pk=instance.pk).update(path=path, depth=depth, updated_at=Now())
+    instance.path, instance.depth = path, depth
+
+
+@receiver(pre_delete, sender=Category)
+def category_remember_subtree(sender, instance, **kwargs):
+    instance._old_node = Category.objects.filter(pk=instance.pk).values_list('path', 'depth').first()
+    instance._product_ids = list(Product.objects.filter(category=instance).values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Category)
+def category_detach_subtree(sender, instance, **kwargs):
+    old_node = getattr(instance, '_old_node', None)
+    if old_node and old_node[0]:
+        # Дочерние категории становятся корнями (parent SET_NULL)
+        move_subtree(old_node[0], '/', -(old_node[1] + 1))
+
+    # category у товаров обнулена через SET_NULL без сохранения моделей
+    product_ids = getattr(instance, '_product_ids', None)
+    if product_ids:
+        Product.objects.filter(id__in=product_ids).update(updated_at=Now())
+
+
+@receiver([post_save, post_delete], sender=Product)
+def product_invalidate_cache(sender, **kwargs):
+    invalidate_tags('product')
+
+
+@receiver([post_save, post_delete], sender=Category)
+def category_invalidate_cache(sender, signal, **kwargs):
+    if signal is post_delete:
+        invalidate_tags('category', 'product')
+    else:
+        invalidate_tags('category')
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Category)
+def schedule_image_variants(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'image' not in update_fields:
+        return
+    schedule_variants(instance, 'product' if sender is Product else 'category')
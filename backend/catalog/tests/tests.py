@@ -1,9 +1,14 @@
 from django.test import TestCase
 import json
+from datetime import timedelta
 from django.core.files.uploadedfile import SimpleUploadedFile
 from user.serializers import UserSerializer
 from django.apps import apps
 import os
+from unittest import mock
+
+from catalog.descriptions import claim_products, process_batch
+from catalog.models import Category, Product
 
 
 class ProductTest(TestCase):
@@ -71,6 +76,208 @@ class ProductTest(TestCase):
         self.assertEqual(response.status_code,204)
         print('product delete done')
 
+    def test_product_image_deduplication(self):
+        image_ = open(os.path.join(apps.get_app_config('catalog').path,'tests/1.jpg'), 'rb').read()
+        names = []
+        for name in ('helmet', 'boots'):
+            image = SimpleUploadedFile(name=name + '.JPG', content=image_, content_type='image/jpeg')
+            response = self.client.post('/product/', data={'name':name, 'description':'descr', 'image':image})
+            self.assertEqual(response.status_code,201)
+            names.append(Product.objects.get(pk=response.data['id']).image.name)
+
+        self.assertEqual(names[0], names[1])
+        self.assertRegex(names[0], r'^product_image/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+        print('product image deduplication done')
+
+    def test_product_pagination(self):
+        for i in range(5):
+            Product.objects.create(name='product{0}'.format(i), sorder_order=5 - i % 2, description='descr')
+
+        response = self.client.get('/product/', {'limit': 2})
+        self.assertEqual(response.status_code,200)
+        names = [product['name'] for product in response.data['results']]
+        self.assertIsNotNone(response.data['next'])
+
+        while response.data['next']:
+            response = self.client.get('/product/', {'limit': 2, 'cursor': response.data['next']})
+            self.assertEqual(response.status_code,200)
+            names += [product['name'] for product in response.data['results']]
+
+        self.assertEqual(names, ['product1', 'product3', 'product0', 'product2', 'product4'])
+
+        response = self.client.get('/product/', {'cursor': 'broken'})
+        self.assertEqual(response.status_code,400)
+        print('product pagination done')
+
+    def test_product_filters(self):
+        Product.objects.create(name='cap', brand='nike', price=100, rating=4, count=3)
+        Product.objects.create(name='boots', brand='nike', price=500, rating=5, count=0)
+        Product.objects.create(name='scarf', brand='gucci', price=300, rating=3, count=1)
+
+        response = self.client.get('/product/', {'brand': 'nike', 'ordering': '-price'})
+        self.assertEqual([product['name'] for product in response.data], ['boots', 'cap'])
+
+        response = self.client.get('/product/', {'price_min': 200, 'in_stock': 'true'})
+        self.assertEqual([product['name'] for product in response.data], ['scarf'])
+
+        response = self.client.get('/product/', {'ordering': 'count'})
+        self.assertEqual(response.status_code,400)
+        print('product filters done')
+
+    def test_product_category_subtree(self):
+        clothes = Category.objects.create(name='clothes')
+        shoes = Category.objects.create(name='shoes', parent=clothes)
+        food = Category.objects.create(name='food')
+        Product.objects.create(name='shirt', category=clothes, sorder_order=2)
+        Product.objects.create(name='boots', category=shoes, sorder_order=1)
+        Product.objects.create(name='bread', category=food)
+
+        response = self.client.get('/product/', {'category_subtree': clothes.id})
+        self.assertEqual([product['name'] for product in response.data], ['boots', 'shirt'])
+
+        response = self.client.get('/product/', {'category_subtree': shoes.id, 'limit': 10})
+        self.assertEqual([product['name'] for product in response.data['results']], ['boots'])
+
+        response = self.client.get('/product/', {'category_subtree': food.id + 100})
+        self.assertEqual(response.data, [])
+
+        #move subtree: cached listing and ETag must follow the category
+        response = self.client.get('/product/', {'category_subtree': food.id})
+        etag = response['ETag']
+        self.assertEqual([product['name'] for product in response.data], ['bread'])
+        response = self.client.put('/category/{0}/'.format(shoes.id), {'parent_id': food.id},
+                                   content_type="application/json")
+        self.assertEqual(response.status_code,200)
+        response = self.client.get('/product/', {'category_subtree': food.id}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code,200)
+        self.assertEqual([product['name'] for product in response.data], ['boots', 'bread'])
+        print('product category subtree done')
+
+    def test_product_description_queue(self):
+        response = self.client.post('/product/', {'name':'helmet'})
+        self.assertEqual(response.status_code,201)
+        self.assertEqual(response.data['description_status'], 'pending')
+        product_id = response.data['id']
+
+        with mock.patch('generate_desc.generate_description.generate_product_description', side_effect=RuntimeError):
+            self.assertEqual(process_batch(10), 1)
+        product = Product.objects.get(pk=product_id)
+        self.assertEqual(product.description_status, 'pending')
+        self.assertEqual(product.description_attempts, 1)
+
+        Product.objects.filter(pk=product_id).update(description_retry_at=product.description_retry_at
+                                                     - timedelta(days=1))
+        with mock.patch('generate_desc.generate_description.generate_product_description', return_value='Прочный шлем'):
+            self.assertEqual(process_batch(10), 1)
+        product.refresh_from_db()
+        self.assertEqual(product.description, 'Прочный шлем')
+        self.assertEqual(product.description_status, 'done')
+        print('product description queue done')
+
+    def test_product_list_description_status(self):
+        body = [{'name':'cap'}, {'name':'boots', 'description':'descr'}]
+        response = self.client.post('/productList/', json.dumps(body), content_type="application/json")
+        self.assertEqual(response.status_code,201)
+        self.assertEqual([row['description_status'] for row in response.data], ['pending', 'done'])
+        self.assertEqual(Product.objects.get(name='cap').description_status, 'pending')
+        print('product list description status done')
+
+    def test_product_list_feeds_description_queue(self):
+        body = [{'name':'cap'}, {'name':'scarf'}, {'name':'boots', 'description':'descr'}]
+        response = self.client.post('/productList/', json.dumps(body), content_type="application/json")
+        self.assertEqual(response.status_code,201)
+        claimed = claim_products(10)
+        self.assertEqual(sorted(product.name for product in claimed), ['cap', 'scarf'])
+        #claimed rows are leased and not handed out twice
+        self.assertEqual(claim_products(10), [])
+        print('product list description queue done')
+
+    def test_product_import(self):
+        category = Category.objects.create(name='hats')
+        Product.objects.create(name='cap', price=100, description='descr')
+        body = '\n'.join([
+            json.dumps({'name':'helmet', 'category':category.id, 'price':300, 'description':'descr'}),
+            json.dumps({'name':'cap', 'price':150}),
+            json.dumps({'name':'scarf', 'category':100500}),
+            'not json',
+        ])
+        response = self.client.post('/product/import/', body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code,200)
+        self.assertEqual(response.data['written'], 1)
+        self.assertEqual([error['row'] for error in response.data['errors']], [4, 2, 3])
+
+        body = 'name,price,description\ncap,150,\nboots,500,descr\n'
+        response = self.client.post('/product/import/?mode=upsert', body, content_type='text/csv')
+        self.assertEqual(response.data['written'], 2)
+        self.assertEqual(Product.objects.get(name='cap').price, 150)
+        self.assertEqual(Product.objects.get(name='cap').description, 'descr')
+        self.assertEqual(Product.objects.get(name='boots').description, 'descr')
+        self.assertEqual(Product.objects.count(), 3)
+
+        #upsert changes only the passed columns
+        Product.objects.filter(name='cap').update(brand='acme', category=category, rating=4, sorder_order=7)
+        body = json.dumps({'name':'cap', 'price':175, 'description':''})
+        response = self.client.post('/product/import/?mode=upsert', body, content_type='application/x-ndjson')
+        self.assertEqual(response.data['written'], 1)
+        cap = Product.objects.get(name='cap')
+        self.assertEqual((cap.price, cap.brand, cap.category_id, cap.rating, cap.sorder_order, cap.description),
+                         (175, 'acme', category.id, 4, 7, 'descr'))
+        self.assertEqual(cap.description_status, 'done')
+        print('product import done')
+
+    def test_product_export(self):
+        Product.objects.create(name='cap', brand='nike', price=100)
+        Product.objects.create(name='boots', brand='gucci', price=500)
+
+        response = self.client.get('/product/export/', {'brand': 'nike'})
+        self.assertEqual(response.status_code,200)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,name,brand,category,price,description,count,rating,sorder_order')
+        self.assertEqual(len(lines), 2)
+
+        response = self.client.get('/product/export/', {'export_format': 'ndjson', 'ordering': '-price'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['name'] for row in rows], ['boots', 'cap'])
+        print('product export done')
+
+    def test_product_conditional_get(self):
+        product = Product.objects.create(name='cap', description='descr')
+
+        response = self.client.get('/product/')
+        etag = response['ETag']
+        response = self.client.get('/product/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code,304)
+
+        response = self.client.get('/product/{0}/'.format(product.id))
+        detail_etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+        response = self.client.get('/product/{0}/'.format(product.id), HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.status_code,304)
+
+        self.client.put('/product/{0}/'.format(product.id), {'price': 10}, content_type="application/json")
+        response = self.client.get('/product/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code,200)
+        response = self.client.get('/product/{0}/'.format(product.id), HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.status_code,200)
+        print('product conditional get done')
+
+    def test_product_search(self):
+        Product.objects.create(name='Кожаные ботинки', brand='gucci', description='Тёплые зимние ботинки')
+        Product.objects.create(name='Шарф', brand='nike', description='Шерстяной шарф')
+
+        response = self.client.get('/product/search/', {'q': 'ботинки'})
+        self.assertEqual(response.status_code,200)
+        self.assertEqual(response.data['mode'], 'fulltext')
+        self.assertEqual([product['name'] for product in response.data['results']], ['Кожаные ботинки'])
+
+        response = self.client.get('/product/search/', {'q': 'Шарфф'})
+        self.assertEqual(response.data['mode'], 'trigram')
+        self.assertEqual([product['name'] for product in response.data['results']], ['Шарф'])
+
+        response = self.client.get('/product/search/')
+        self.assertEqual(response.status_code,400)
+        print('product search done')
+
 
 class CategorytTest(TestCase):
     def setUp(self):
@@ -129,3 +336,60 @@ class CategorytTest(TestCase):
         response = self.client.delete('/category/{0}/'.format(category_id))
         self.assertEqual(response.status_code,204)
         print('category delete done')
+
+    def test_category_cache_invalidation(self):
+        Category.objects.create(name='hats')
+        response = self.client.get('/category/', {'limit': 10})
+        self.assertEqual(len(response.data['results']), 1)
+
+        self.client.post('/category/', json.dumps({'name':'boots'}), content_type="application/json")
+        response = self.client.get('/category/', {'limit': 10})
+        self.assertEqual([category['name'] for category in response.data['results']], ['hats', 'boots'])
+        print('category cache invalidation done')
+
+    def test_category_tree(self):
+        clothes = Category.objects.create(name='clothes')
+        shoes = Category.objects.create(name='shoes', parent=clothes)
+        boots = Category.objects.create(name='boots', parent=shoes)
+        sale = Category.objects.create(name='sale')
+
+        response = self.client.get('/category/tree/')
+        self.assertEqual(response.status_code,200)
+        self.assertEqual([node['name'] for node in response.data], ['clothes', 'sale'])
+        self.assertEqual(response.data[0]['children'][0]['children'][0]['name'], 'boots')
+
+        #move subtree
+        response = self.client.put('/category/{0}/'.format(shoes.id), {'parent_id': sale.id},
+                                   content_type="application/json")
+        self.assertEqual(response.status_code,200)
+        boots.refresh_from_db()
+        self.assertEqual(boots.path, '/{0}/{1}/{2}/'.format(sale.id, shoes.id, boots.id))
+        self.assertEqual(boots.depth, 2)
+
+        response = self.client.put('/category/{0}/'.format(sale.id), {'parent_id': boots.id},
+                                   content_type="application/json")
+        self.assertEqual(response.status_code,400)
+
+        response = self.client.get('/category/tree/', {'root': sale.id})
+        self.assertEqual(response.data['children'][0]['name'], 'shoes')
+        response = self.client.get('/category/tree/', {'root': sale.id, 'depth': 0})
+        self.assertEqual(response.data['children'], [])
+        response = self.client.get('/category/tree/', {'root': sale.id, 'depth': -1})
+        self.assertEqual(response.status_code,400)
+        response = self.client.get('/category/tree/', {'depth': 'deep'})
+        self.assertEqual(response.status_code,400)
+
+        #delete detaches subtree
+        self.client.delete('/category/{0}/'.format(sale.id))
+        boots.refresh_from_db()
+        self.assertEqual(boots.path, '/{0}/{1}/'.format(shoes.id, boots.id))
+        self.assertEqual(boots.depth, 1)
+
+        #categories created before path existed
+        Category.objects.update(path='', depth=0)
+        response = self.client.put('/category/{0}/'.format(shoes.id), {'name': 'footwear'},
+                                   content_type="application/json")
+        self.assertEqual(response.status_code,200)
+        boots.refresh_from_db()
+        self.assertEqual(boots.path, '/{0}/{1}/'.format(shoes.id, boots.id))
+        print('category tree done')
@@ -0,0 +1,85 @@
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Now, Substr
+
+from backend.cache import invalidate_tags
+from catalog.models import Category
+
+REBUILD_TREE_SQL = """
+    WITH RECURSIVE tree (id, path, depth) AS (
+        SELECT id, '/' || id || '/', 0
+        FROM category
+        WHERE parent_id IS NULL
+        UNION ALL
+        SELECT c.id, t.path || c.id || '/', t.depth + 1
+        FROM category c
+        JOIN tree t ON c.parent_id = t.id
+        WHERE position('/' || c.id || '/' in t.path) = 0
+    )
+    UPDATE category
+    SET path = tree.path, depth = tree.depth, updated_at = now()
+    FROM tree
+    WHERE category.id = tree.id
+      AND (category.path IS DISTINCT FROM tree.path OR category.depth IS DISTINCT FROM tree.depth)
+"""
+
+
+def get_node_path(category_id):
+    """Возвращает (path, depth) категории или ('/', -1) для корня дерева."""
+    if category_id is None:
+        return '/', -1
+    node = Category.objects.filter(pk=category_id).values_list('path', 'depth').first()
+    if node is not None and not node[0]:
+        # Категория создана до появления path и дерево ещё не пересчитано
+        rebuild_tree()
+        node = Category.objects.filter(pk=category_id).values_list('path', 'depth').first()
+    # Узел цикла остаётся без path, вложенные в него считаются корнями
+    return node if node and node[0] else ('/', -1)
+
+
+def is_descendant(category, parent):
+    """True, если parent совпадает с category или лежит в её поддереве."""
+    return bool(category.path) and parent is not None and parent.path.startswith(category.path)
+
+
+def move_subtree(old_path, new_path, depth_delta):
+    """Переносит поддерево одним UPDATE, переписывая префикс materialized path."""
+    return Category.objects.filter(path__startswith=old_path).update(
+        path=Concat(Value(new_path), Substr('path', len(old_path) + 1)),
+        depth=F('depth') + depth_delta,
+        updated_at=Now(),
+    )
+
+
+def build_tree(categories, serialized):
+    """
+    Собирает вложенное дерево из плоского списка категорий,
+    отсортированного по depth. Узлы, родитель которых не попал в выборку,
+    становятся корнями.
+    """
+    nodes = {}
+    roots = []
+    for category, data in zip(categories, serialized):
+        node = dict(data, children=[])
+        nodes[category.id] = node
+        parent = nodes.get(category.parent_id)
+        if parent is None:
+            roots.append(node)
+        else:
+            parent['children'].append(node)
+    return roots
+
+
+def rebuild_tree(using=DEFAULT_DB_ALIAS):
+    """Пересчитывает path и depth всех категорий одним рекурсивным запросом."""
+    with connections[using].cursor() as cursor:
+        cursor.execute(REBUILD_TREE_SQL)
+        updated = cursor.rowcount
+    if updated:
+        invalidate_tags('category')
+    return updated
+
+
+def install_tree_paths(sender, using, **kwargs):
+    """Заполняет path категорий, созданных до его появления (post_migrate приложения catalog)."""
+    rebuild_tree(using)
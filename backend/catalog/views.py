@@ -1,3 +1,4 @@
+from django.conf import settings
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework.response import Response
@@ -5,9 +6,16 @@ from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 
+from backend.cache import cache_response
+from backend.conditional import detail_etag, list_etag
+from backend.export import EXPORT_FORMATS, EXPORT_PARAMETERS, export_response
+from backend.pagination import KeysetPagination, PAGINATION_PARAMETERS
+from catalog.filters import PRODUCT_FILTER_PARAMETERS, filter_products, get_product_ordering
+from catalog.imports import ProductImport, iter_csv, iter_lines, iter_ndjson
 from catalog.models import Product, Category
+from catalog.search import search_products
+from catalog.tree import build_tree, is_descendant
 from catalog.serializers import ProductSerializer, CategorySerializer
-from generate_desc import generate_description
 
 
 class ProductAPIView(APIView):
@@ -18,31 +26,23 @@ class ProductAPIView(APIView):
     @swagger_auto_schema(
         operation_description="Получение всех товаров",
         manual_parameters=[
-            openapi.Parameter('id', in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
-                              description='id товара'),
-            openapi.Parameter('name', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
-                              description='Название товара'),
-            openapi.Parameter('description', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
-                              description='Описание товара'),
-            openapi.Parameter('brand', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
-                              description='Название бренда товара'),
-            openapi.Parameter('category', in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
-                              description='id категории к которой относится товар'),
-            openapi.Parameter('price', in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
-                              description='Цена товара'),
-            openapi.Parameter('count', in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
-                              description='Количество товара'),
-            openapi.Parameter('rating', in_=openapi.IN_QUERY, type=openapi.FORMAT_FLOAT,
-                              description='Рейтинг товара'),
-            openapi.Parameter('sorder_order', in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
-                              description='Позиция товара в списке'),
-            openapi.Parameter('image', in_=openapi.IN_QUERY, type=openapi.TYPE_FILE,
-                              description='Изображение товара'),
-
+            *PRODUCT_FILTER_PARAMETERS,
+            *PAGINATION_PARAMETERS,
         ]
     )
+    # фильтр category_subtree зависит от путей категорий, поэтому список
+    # устаревает и при перемещении категорий
+    @list_etag(Product, Category)
+    @cache_response('product', 'category')
     def get(self, request):
-        products = Product.objects.all()
+        ordering = get_product_ordering(request.query_params)
+        products = filter_products(Product.objects.all(), request.query_params).order_by(*ordering)
+        paginator = KeysetPagination(ordering=ordering)
+        page = paginator.paginate_queryset(products, request)
+        if page is not None:
+            serializer = ProductSerializer(page, many=True)
+            return paginator.get_paginated_response(serializer.data)
+
         serializer = ProductSerializer(products, many=True)
         return Response(serializer.data)
 
@@ -61,8 +61,6 @@ class ProductAPIView(APIView):
                                            description='id категории к которой относится товар (необязательное поле)'),
                 'price': openapi.Schema(type=openapi.TYPE_INTEGER,
                                         description='Цена товара (по умолчанию 1)'),
-                'count': openapi.Schema(type=openapi.TYPE_INTEGER,
-                                        description='Количество товара (по умолчанию 0)'),
                 'rating': openapi.Schema(type=openapi.FORMAT_FLOAT,
                                          description='Рейтинг товара (по умолчанию 5)'),
                 'sorder_order': openapi.Schema(type=openapi.TYPE_INTEGER,
@@ -113,6 +111,8 @@ class ProductAPIViewDetail(APIView):
 
         ]
     )
+    @detail_etag(Product)
+    @cache_response('product')
     def get(self, request, pk):
 
         try:
@@ -141,8 +141,6 @@ class ProductAPIViewDetail(APIView):
                                            description='id категории к которой относится товар (необязательное поле)'),
                 'price': openapi.Schema(type=openapi.TYPE_INTEGER,
                                         description='Цена товара (по умолчанию 1)'),
-                'count': openapi.Schema(type=openapi.TYPE_INTEGER,
-                                        description='Количество товара (по умолчанию 0)'),
                 'rating': openapi.Schema(type=openapi.FORMAT_FLOAT,
                                          description='Рейтинг товара (по умолчанию 5)'),
                 'sorder_order': openapi.Schema(type=openapi.TYPE_INTEGER,
@@ -207,8 +205,6 @@ class ProductListAPIView(APIView):
                                                description='id категории к которой относится товар (необязательное поле)'),
                     'price': openapi.Schema(type=openapi.TYPE_INTEGER,
                                             description='Цена товара (по умолчанию 1)'),
-                    'count': openapi.Schema(type=openapi.TYPE_INTEGER,
-                                            description='Количество товара (по умолчанию 0)'),
                     'rating': openapi.Schema(type=openapi.FORMAT_FLOAT,
                                              description='Рейтинг товара (по умолчанию 5)'),
                     'sorder_order': openapi.Schema(type=openapi.TYPE_INTEGER,
@@ -232,6 +228,96 @@ class ProductListAPIView(APIView):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+class ProductExportAPIView(APIView):
+    """Потоковая выгрузка товаров"""
+
+    permission_classes = [IsAuthenticated]
+
+    fields = ('id', 'name', 'brand', 'category', 'price', 'description', 'count', 'rating', 'sorder_order')
+
+    @swagger_auto_schema(
+        operation_description="Выгрузка товаров в CSV или NDJSON. Фильтры и сортировка такие же, "
+                              "как у списка товаров",
+        manual_parameters=[
+            *EXPORT_PARAMETERS,
+            *PRODUCT_FILTER_PARAMETERS,
+        ]
+    )
+    @list_etag(Product, Category)
+    def get(self, request):
+        export_format = request.query_params.get('export_format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return Response({'error': 'export_format должен быть csv или ndjson'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        ordering = get_product_ordering(request.query_params)
+        products = filter_products(Product.objects.all(), request.query_params).order_by(*ordering)
+        return export_response(products, self.fields, export_format, 'products')
+
+
+class ProductImportAPIView(APIView):
+    """Потоковый импорт товаров"""
+
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Импорт товаров из NDJSON (по одному JSON-объекту на строку) или CSV с заголовком "
+                              "(Content-Type: text/csv). Поля строки такие же, как при создании товара, кроме "
+                              "изображения. Строки проверяются и записываются пачками, в ответе возвращается "
+                              "список ошибок с номерами строк",
+        manual_parameters=[
+            openapi.Parameter('mode', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=['create', 'upsert'],
+                              description='create - только новые товары (по умолчанию), '
+                                          'upsert - обновлять товары с совпадающим названием; меняются '
+                                          'только переданные в строке поля, пустые ячейки CSV и пустое '
+                                          'описание сохранённые значения не затирают'),
+        ]
+    )
+    def post(self, request):
+        mode = request.query_params.get('mode', 'create')
+        if mode not in ('create', 'upsert'):
+            return Response({'error': 'mode должен быть create или upsert'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        lines = iter_lines(request.stream)
+        is_csv = request.content_type.startswith('text/csv')
+        rows = iter_csv(lines) if is_csv else iter_ndjson(lines)
+        try:
+            report = ProductImport(upsert=mode == 'upsert').run(rows)
+        except UnicodeDecodeError:
+            return Response({'error': 'Файл должен быть в кодировке UTF-8'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(report)
+
+
+class ProductSearchAPIView(APIView):
+    """Поиск товаров"""
+
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Полнотекстовый поиск товаров по названию, бренду и описанию. "
+                              "Если совпадений нет, выполняется поиск по похожим названиям (опечатки)",
+        manual_parameters=[
+            openapi.Parameter('q', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description='Поисковый запрос (обязательный параметр)'),
+            openapi.Parameter('limit', in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description='Максимальное количество результатов'),
+        ]
+    )
+    @cache_response('product')
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'Параметр q обязателен'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        limit = KeysetPagination().get_limit(request.query_params.get('limit', settings.PRODUCT_SEARCH_LIMIT))
+        products, mode = search_products(query, limit)
+        serializer = ProductSerializer(products, many=True)
+        return Response({'mode': mode, 'results': serializer.data})
+
+
 class CategoryAPIView(APIView):
     """Получение/создание категорий"""
 
@@ -250,10 +336,19 @@ class CategoryAPIView(APIView):
                               description='Позиция категории в списке'),
             openapi.Parameter('image', in_=openapi.IN_QUERY, type=openapi.TYPE_FILE,
                               description='Изображение категории'),
+            *PAGINATION_PARAMETERS,
         ]
     )
+    @list_etag(Category)
+    @cache_response('category')
     def get(self, request):
         categories = Category.objects.all()
+        paginator = KeysetPagination(ordering=('sorder_order', 'id'))
+        page = paginator.paginate_queryset(categories, request)
+        if page is not None:
+            serializer = CategorySerializer(page, many=True)
+            return paginator.get_paginated_response(serializer.data)
+
         serializer = CategorySerializer(categories, many=True)
         return Response(serializer.data)
 
@@ -311,6 +406,8 @@ class CategoryAPIViewDetail(APIView):
 
         ]
     )
+    @detail_etag(Category)
+    @cache_response('category')
     def get(self, request, pk):
 
         try:
@@ -355,6 +452,9 @@ class CategoryAPIViewDetail(APIView):
             if new_parent_id is not None:
                 try:
                     new_parent_category = Category.objects.get(pk=new_parent_id)
+                    if is_descendant(category, new_parent_category):
+                        return Response({'error': 'Категория не может быть вложена в собственную подкатегорию'},
+                                        status=status.HTTP_400_BAD_REQUEST)
                     category.parent = new_parent_category
                     category.save()
                 except Category.DoesNotExist:
@@ -411,3 +511,54 @@ class CategoryAPIViewByParent(APIView):
 
         except Category.DoesNotExist:
             return Response({'error': 'The category with the specified ID was not found'}, status=404)
+
+
+class CategoryTreeAPIView(APIView):
+    """Получение дерева категорий"""
+
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Получение дерева категорий целиком или поддерева указанной категории. "
+                              "Каждая категория содержит список дочерних категорий в поле children",
+        manual_parameters=[
+            openapi.Parameter('root', in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description='id корневой категории поддерева'),
+            openapi.Parameter('depth', in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description='Максимальная глубина относительно корня'),
+        ]
+    )
+    @list_etag(Category)
+    @cache_response('category')
+    def get(self, request):
+        categories = Category.objects.order_by('depth', 'sorder_order', 'id')
+
+        root_id = request.query_params.get('root')
+        root_depth = -1
+        if root_id:
+            try:
+                root = Category.objects.get(pk=root_id)
+            except (Category.DoesNotExist, ValueError):
+                return Response({'error': 'Категория не найдена'}, status=status.HTTP_404_NOT_FOUND)
+            categories = categories.filter(path__startswith=root.path)
+            root_depth = root.depth
+
+        depth = request.query_params.get('depth')
+        if depth:
+            try:
+                depth = int(depth)
+            except ValueError:
+                depth = -1
+            if depth < 0:
+                return Response({'error': 'depth должен быть неотрицательным целым числом'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            categories = categories.filter(depth__lte=root_depth + depth)
+
+        categories = list(categories)
+        serializer = CategorySerializer(categories, many=True)
+        tree = build_tree(categories, serializer.data)
+        if root_id:
+            if not tree:
+                return Response({'error': 'Категория не найдена'}, status=status.HTTP_404_NOT_FOUND)
+            return Response(tree[0])
+        return Response(tree)
@@ -0,0 +1,180 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import F
+
+from generate_desc.generate_description import PROMPT_VERSION, generate_descriptions
+from generate_desc.models import DescriptionCache
+
+SIZE_TOKENS = {'xxs', 'xs', 's', 'm', 'l', 'xl', 'xxl', 'xxxl', 'размер', 'size', 'рост'}
+# Размером считается число с единицей измерения ("500мл", "42р") или с
+# разделителем размеров ("42x30", "48-50"). Голое число - часть модели
+# ("PlayStation 5", "Air Max 90") и убирается только рядом со словом размера
+SIZE_UNITS = r'(мм|см|м|мл|л|г|кг|gb|tb|р)'
+SIZE_PATTERN = re.compile(rf'^\d+([.,]\d+)?(([xх×/-]\d+([.,]\d+)?)+{SIZE_UNITS}?|{SIZE_UNITS})$')
+NUMBER_PATTERN = re.compile(r'^\d+([.,]\d+)?$')
+COLOUR_TOKENS = {
+    'black', 'white', 'red', 'blue', 'green', 'yellow', 'grey', 'gray', 'pink', 'brown', 'beige',
+    'purple', 'orange', 'navy', 'цвет', 'color', 'colour',
+}
+COLOUR_PATTERN = re.compile(
+    r'^(черн|бел|красн|син|зелен|желт|сер|розов|голуб|коричнев|бежев|фиолетов|оранжев|бордов|хаки)'
+    r'(ый|ий|ой|ая|яя|ое|ее|ые|ие|ого|его)?$'
+)
+
+
+def normalize_name(name):
+    """
+    Приводит название товара к ключу кэша: нижний регистр, без знаков
+    препинания, размеров и цветов. Варианты одного товара
+    ("Футболка Nike белая XL", "Футболка Nike, чёрная, M") получают один ключ.
+    """
+    tokens = [token.strip('.,/-') for token in re.findall(r'[\w.,/×-]+', name.lower().replace('ё', 'е'))]
+    words = []
+    for index, token in enumerate(tokens):
+        if not token or token in SIZE_TOKENS or token in COLOUR_TOKENS:
+            continue
+        if SIZE_PATTERN.match(token) or COLOUR_PATTERN.match(token):
+            continue
+        if NUMBER_PATTERN.match(token) and index and tokens[index - 1] in SIZE_TOKENS:
+            continue
+        words.append(token)
+    return ' '.join(words)[:255] or name.lower()[:255]
+
+
+class LRUCache:
+    """Потокобезопасный LRU-кэш в памяти процесса с ограниченным временем жизни записей."""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class CacheStats:
+    """Счётчики попаданий и промахов кэша в текущем процессе."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def add(self, memory_hits=0, db_hits=0, misses=0):
+        with self._lock:
+            self.memory_hits += memory_hits
+            self.db_hits += db_hits
+            self.misses += misses
+
+    def reset(self):
+        with self._lock:
+            self.memory_hits = 0
+            self.db_hits = 0
+            self.misses = 0
+
+    def as_dict(self):
+        with self._lock:
+            return {'memory_hits': self.memory_hits, 'db_hits': self.db_hits, 'misses': self.misses}
+
+
+memory_cache = LRUCache(settings.DESCRIPTION_CACHE_SIZE, settings.DESCRIPTION_CACHE_TTL)
+stats = CacheStats()
+
+
+def get_cached_descriptions(keys):
+    """Ищет описания сначала в памяти, затем одним запросом в таблице кэша."""
+    found = {}
+    for key in keys:
+        description = memory_cache.get((key, PROMPT_VERSION))
+        if description is not None:
+            found[key] = description
+    memory_hits = len(found)
+
+    missing = [key for key in keys if key not in found]
+    if missing:
+        rows = list(DescriptionCache.objects
+                    .filter(key__in=missing, prompt_version=PROMPT_VERSION)
+                    .values_list('id', 'key', 'description'))
+        for _, key, description in rows:
+            found[key] = description
+            memory_cache.set((key, PROMPT_VERSION), description)
+        if rows:
+            DescriptionCache.objects.filter(id__in=[row[0] for row in rows]).update(hit_count=F('hit_count') + 1)
+
+    stats.add(memory_hits=memory_hits, db_hits=len(found) - memory_hits, misses=len(keys) - len(found))
+    return found
+
+
+def store_descriptions(descriptions):
+    """Сохраняет сгенерированные описания {key: description}; пустые не кэшируются."""
+    rows = [DescriptionCache(key=key, prompt_version=PROMPT_VERSION, description=description)
+            for key, description in descriptions.items() if description]
+    DescriptionCache.objects.bulk_create(rows, ignore_conflicts=True)
+    for row in rows:
+        memory_cache.set((row.key, PROMPT_VERSION), row.description)
+
+
+def generate_descriptions_cached(product_names, max_workers, batch_size):
+    """
+    То же, что generate_descriptions, но с кэшем по нормализованному названию:
+    к модели уходит один запрос на каждый уникальный ключ, которого нет в кэше.
+    """
+    keys = [normalize_name(name) for name in product_names]
+    unique_keys = list(dict.fromkeys(keys))
+    found = get_cached_descriptions(unique_keys)
+
+    missing = {}
+    for name, key in zip(product_names, keys):
+        if key not in found:
+            missing.setdefault(key, name)
+    if missing:
+        generated = dict(zip(missing, generate_descriptions(list(missing.values()), max_workers, batch_size)))
+        store_descriptions(generated)
+        found.update(generated)
+
+    return [found.get(key, '') for key in keys]
+
+
+def invalidate(name=None):
+    """
+    Удаляет записи кэша: для одного названия или все. Кэш в памяти других
+    процессов устаревает не позднее чем через DESCRIPTION_CACHE_TTL секунд.
+    """
+    entries = DescriptionCache.objects.all()
+    if name:
+        key = normalize_name(name)
+        entries = entries.filter(key=key)
+        memory_cache.delete((key, PROMPT_VERSION))
+    else:
+        memory_cache.clear()
+    deleted, _ = entries.delete()
+    return deleted
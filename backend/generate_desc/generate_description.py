@@ -1,9 +1,17 @@
+import logging
 import re
+from concurrent.futures import ThreadPoolExecutor
 
 from g4f.client import Client
 from g4f.Provider import Blackbox
 from g4f.providers.retry_provider import RetryProvider
 from g4f import debug
+
+logger = logging.getLogger(__name__)
+
+# Меняется при изменении промптов, чтобы не использовать старые описания из кэша
+PROMPT_VERSION = '1'
+
 client = Client(
     provider=RetryProvider([Blackbox],
                             single_provider_retry= True)
@@ -26,7 +34,17 @@ def generate_product_description(product_name):
         messages=[{"role": "user",
                    "content": f"Сгенерируй описание для товара на русском примерно в 15 слов, только описание текст: {product_name}"}],
     )
-    description = response.choices[0].message.content
+    return clean_description(response.choices[0].message.content)
+
+
+def clean_description(description):
+    """
+    Оставляет в ответе модели только текст описания на русском.
+
+    description (str): Ответ модели.
+
+    return: str: Очищенное описание.
+    """
     pattern = r"[^а-яА-Я\s.,!?;:\"\'\[\]\(\)\{\}]+"
 
     description = re.sub(pattern, '', description)
@@ -37,4 +55,59 @@ def generate_product_description(product_name):
     if description.startswith('.'):
         description = description[1:]
 
-    return description
+    return description.strip()
+
+
+def generate_product_descriptions(product_names):
+    """
+    Генерирует описания для нескольких продуктов одним запросом к модели.
+
+    product_names (list[str]): Названия продуктов.
+
+    return: list[str]: Описания в том же порядке. Если модель пропустила
+    продукт, для него выполняется отдельный запрос.
+    """
+    if len(product_names) == 1:
+        return [generate_product_description(product_names[0])]
+
+    names = "\n".join(f"{number}. {name}" for number, name in enumerate(product_names, start=1))
+    response = client.chat.completions.create(
+        model="",
+        messages=[{"role": "user",
+                   "content": "Сгенерируй описания для товаров на русском примерно в 15 слов каждое. "
+                              "Ответь нумерованным списком в том же порядке, по одному описанию на строку, "
+                              f"только текст описаний:\n{names}"}],
+    )
+
+    descriptions = {}
+    for line in response.choices[0].message.content.splitlines():
+        match = re.match(r"^\s*(\d+)[.)]\s*(.+)$", line)
+        if match:
+            descriptions[int(match.group(1))] = clean_description(match.group(2))
+
+    return [descriptions.get(number) or generate_product_description(name)
+            for number, name in enumerate(product_names, start=1)]
+
+
+def generate_descriptions(product_names, max_workers, batch_size):
+    """
+    Генерирует описания для списка продуктов параллельно.
+
+    Названия делятся на пачки по batch_size (одна пачка - один запрос к модели),
+    пачки обрабатываются пулом из max_workers потоков. Ошибка в пачке не
+    прерывает остальные: для её продуктов возвращается пустое описание.
+
+    return: list[str]: Описания в том же порядке, что и product_names.
+    """
+    batches = [product_names[i:i + batch_size] for i in range(0, len(product_names), batch_size)]
+
+    def generate(batch):
+        try:
+            return generate_product_descriptions(batch)
+        except Exception:
+            logger.exception('Не удалось сгенерировать описания для %s товаров', len(batch))
+            return [''] * len(batch)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(generate, batches)
+    return [description for batch in results for description in batch]
@@ -0,0 +1,14 @@
+from django.db import models
+
+
+class DescriptionCache(models.Model):
+    id = models.BigAutoField(primary_key=True)
+    key = models.CharField('key', max_length=255)
+    prompt_version = models.CharField('prompt_version', max_length=20)
+    description = models.CharField('description', default='')
+    hit_count = models.IntegerField('hit_count', default=0)
+    created_at = models.DateTimeField('created_at', auto_now_add=True)
+
+    class Meta:
+        db_table = 'description_cache'
+        unique_together = ('key', 'prompt_version')
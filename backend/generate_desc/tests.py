@@ -0,0 +1,41 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from generate_desc import cache
+from generate_desc.models import DescriptionCache
+
+
+class DescriptionCacheTest(TestCase):
+    def setUp(self):
+        cache.memory_cache.clear()
+
+    def test_normalize_name(self):
+        self.assertEqual(cache.normalize_name('Футболка Nike белая XL'), 'футболка nike')
+        self.assertEqual(cache.normalize_name('Футболка NIKE, чёрная, 48-50'), 'футболка nike')
+        self.assertEqual(cache.normalize_name('Кроссовки Adidas, размер 42'), 'кроссовки adidas')
+        self.assertEqual(cache.normalize_name('Вода Aqua 500мл'), 'вода aqua')
+        self.assertEqual(cache.normalize_name('Коврик Yoga 180x60'), 'коврик yoga')
+        #model numbers are part of the name
+        self.assertNotEqual(cache.normalize_name('PlayStation 4'), cache.normalize_name('PlayStation 5'))
+        self.assertNotEqual(cache.normalize_name('Nike Air Max 90'), cache.normalize_name('Nike Air Max 97'))
+        print('normalize name done')
+
+    def test_cached_generation(self):
+        path = 'generate_desc.generate_description.generate_product_descriptions'
+        with mock.patch(path, return_value=['Удобная футболка']) as generate:
+            descriptions = cache.generate_descriptions_cached(
+                ['Футболка Nike белая XL', 'Футболка Nike черная M'], max_workers=2, batch_size=5)
+        self.assertEqual(descriptions, ['Удобная футболка', 'Удобная футболка'])
+        generate.assert_called_once_with(['Футболка Nike белая XL'])
+
+        cache.memory_cache.clear()
+        with mock.patch(path) as generate:
+            descriptions = cache.generate_descriptions_cached(['Футболка Nike S'], max_workers=2, batch_size=5)
+        self.assertEqual(descriptions, ['Удобная футболка'])
+        generate.assert_not_called()
+        self.assertEqual(DescriptionCache.objects.get().hit_count, 1)
+
+        self.assertEqual(cache.invalidate('Футболка Nike'), 1)
+        self.assertFalse(DescriptionCache.objects.exists())
+        print('cached generation done')
@@ -0,0 +1,41 @@
+from django.db.models import Count, Sum
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.views import APIView
+
+from generate_desc import cache
+from generate_desc.generate_description import PROMPT_VERSION
+from generate_desc.models import DescriptionCache
+
+
+class DescriptionCacheAPIView(APIView):
+    """Статистика и очистка кэша сгенерированных описаний"""
+
+    permission_classes = [IsAdminUser]
+
+    @swagger_auto_schema(
+        operation_description="Статистика кэша описаний: количество записей и попаданий в базе, "
+                              "счётчики текущего процесса",
+    )
+    def get(self, request):
+        totals = DescriptionCache.objects.aggregate(entries=Count('id'), hits=Sum('hit_count'))
+        return Response({
+            'prompt_version': PROMPT_VERSION,
+            'entries': totals['entries'],
+            'hits': totals['hits'] or 0,
+            'process': cache.stats.as_dict(),
+        })
+
+    @swagger_auto_schema(
+        operation_description="Очистка кэша описаний. Без параметра name удаляются все записи",
+        manual_parameters=[
+            openapi.Parameter('name', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description='Название товара, для которого нужно сбросить описание'),
+        ]
+    )
+    def delete(self, request):
+        deleted = cache.invalidate(request.query_params.get('name'))
+        return Response({'deleted': deleted}, status=status.HTTP_200_OK)
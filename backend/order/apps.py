@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+class OrderConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'order'
+
+    def ready(self):
+        from order import signals  # noqa: F401
+        from order.partitions import install_partitions
+
+        post_migrate.connect(install_partitions, sender=self)
@@ -0,0 +1,84 @@
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from drf_yasg import openapi
+from rest_framework.exceptions import ValidationError
+
+from order.partitions import add_months, month_start
+
+CREATED_FILTER_PARAMETERS = [
+    openapi.Parameter('created_from', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                      description='Заказы, созданные не раньше даты (YYYY-MM-DD или ISO 8601)'),
+    openapi.Parameter('created_to', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                      description='Заказы, созданные раньше даты (YYYY-MM-DD - до конца дня, или ISO 8601)'),
+]
+
+ORDER_FILTER_PARAMETERS = [
+    openapi.Parameter('user', in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                      description='id пользователя'),
+    openapi.Parameter('status', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                      description='Статус заказа'),
+    *CREATED_FILTER_PARAMETERS,
+]
+
+
+def _parse_moment(params, name, end_of_day=False):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        moment = parse_datetime(value)
+        if moment is None:
+            date = parse_date(value)
+            if date is None:
+                raise ValueError(value)
+            moment = datetime.combine(date, time.min)
+            if end_of_day:
+                moment += timedelta(days=1)
+    except ValueError:
+        raise ValidationError({name: 'Некорректная дата'})
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def recent_orders_start():
+    """
+    Начало окна свежих заказов: первое число месяца ORDER_RECENT_MONTHS
+    месяцев назад, чтобы запрос читал только партиции последних месяцев.
+    None, если окно отключено (ORDER_RECENT_MONTHS = 0).
+    """
+    if not settings.ORDER_RECENT_MONTHS:
+        return None
+    return timezone.make_aware(datetime.combine(add_months(month_start(), -settings.ORDER_RECENT_MONTHS), time.min))
+
+
+def filter_orders(queryset, params, recent=False):
+    """
+    Применяет фильтры списка заказов из query-параметров запроса. С recent
+    без created_from возвращаются только заказы из окна recent_orders_start().
+    """
+    user = params.get('user')
+    if user:
+        try:
+            queryset = queryset.filter(user_id=int(user))
+        except ValueError:
+            raise ValidationError({'user': 'Некорректное значение'})
+
+    order_status = params.get('status')
+    if order_status:
+        queryset = queryset.filter(status=order_status)
+
+    created_from = _parse_moment(params, 'created_from')
+    if created_from is None and recent:
+        created_from = recent_orders_start()
+    if created_from is not None:
+        queryset = queryset.filter(created_at__gte=created_from)
+
+    created_to = _parse_moment(params, 'created_to', end_of_day=True)
+    if created_to is not None:
+        queryset = queryset.filter(created_at__lt=created_to)
+
+    return queryset
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from order.partitions import archivable_months, archive_month, month_start, parse_month
+
+
+class Command(BaseCommand):
+    help = ('Отключает партиции заказов и строк заказов за месяцы раньше --before и выгружает их '
+            'в сжатые CSV (восстановление - restore_orders). Сводки продаж не меняются')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', required=True, help='Первый месяц, который остаётся в базе, YYYY-MM')
+        parser.add_argument('--dir', dest='directory', help='Каталог архивов (по умолчанию ORDER_ARCHIVE_DIR)')
+        parser.add_argument('--detach-only', action='store_true',
+                            help='Только отключить партиции, оставив их отдельными таблицами')
+
+    def handle(self, *args, **options):
+        try:
+            before = parse_month(options['before'])
+        except ValueError:
+            raise CommandError(f'Некорректный месяц: {options["before"]}')
+        if before > month_start():
+            raise CommandError('Нельзя архивировать текущий месяц и будущие')
+
+        for month in archivable_months(before):
+            for item in archive_month(month, options['directory'], options['detach_only']):
+                self.stdout.write(item)
+        self.stdout.write(self.style.SUCCESS('Готово'))
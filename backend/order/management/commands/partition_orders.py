@@ -0,0 +1,35 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from order.partitions import extend_partitions, partition_tables
+
+
+class Command(BaseCommand):
+    help = ('Переводит заказы и строки заказов на помесячные партиции (однократно, после migrate; '
+            'таблицы блокируются на время переноса) и создаёт партиции на следующие месяцы. '
+            'С --loop раз в ORDER_PARTITION_POLL_INTERVAL секунд только добавляет партиции '
+            'наперёд (сервис order-partitioner в docker-compose)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahead', type=int,
+                            help='На сколько месяцев вперёд создать партиции (по умолчанию '
+                                 'ORDER_PARTITION_AHEAD_MONTHS)')
+        parser.add_argument('--loop', action='store_true',
+                            help='Не преобразовывать таблицы, а периодически создавать партиции на '
+                                 'следующие месяцы, чтобы новые заказы не попадали в партицию по умолчанию')
+
+    def handle(self, *args, **options):
+        if not options['loop']:
+            converted, created = partition_tables(options['ahead'])
+            for table in converted:
+                self.stdout.write(f'Таблица {table} разбита на партиции')
+            self.stdout.write(self.style.SUCCESS(f'Создано партиций: {len(created)}'))
+            return
+
+        while True:
+            created = extend_partitions(options['ahead'])
+            if created:
+                self.stdout.write(f'Создано партиций: {len(created)}')
+            time.sleep(settings.ORDER_PARTITION_POLL_INTERVAL)
@@ -0,0 +1,23 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from order.reservations import release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = 'Возвращает на склады резервы заказов с истёкшим сроком'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help='Проверять резервы каждые STOCK_RESERVATION_POLL_INTERVAL секунд')
+
+    def handle(self, *args, **options):
+        while True:
+            released = release_expired_reservations()
+            if released or not options['loop']:
+                self.stdout.write(f'Снято резервов: {released}')
+            if not options['loop']:
+                break
+            time.sleep(settings.STOCK_RESERVATION_POLL_INTERVAL)
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from order.partitions import parse_month, reattach_month, restore_archive
+
+
+class Command(BaseCommand):
+    help = 'Возвращает в базу архивы партиций заказов (файлы archive_orders) или отключённые месяцы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='*', help='Файлы <таблица>_YYYY_MM.csv.gz')
+        parser.add_argument('--month', action='append', default=[],
+                            help='Подключить обратно месяц, отключённый с --detach-only, YYYY-MM')
+
+    def handle(self, *args, **options):
+        if not options['files'] and not options['month']:
+            raise CommandError('Укажите файлы архивов или --month')
+
+        months = []
+        for value in options['month']:
+            try:
+                months.append(parse_month(value))
+            except ValueError:
+                raise CommandError(f'Некорректный месяц: {value}')
+
+        try:
+            for path in options['files']:
+                self.stdout.write(restore_archive(path))
+            for month in months:
+                for name in reattach_month(month):
+                    self.stdout.write(name)
+        except ValueError as error:
+            raise CommandError(str(error))
+        self.stdout.write(self.style.SUCCESS('Готово'))
@@ -1,23 +1,90 @@
 from django.db import models
+from django.utils import timezone
 from user.models import User
 from catalog.models import Product
+from storage.models import ProductStorage
+
+class OrderStatus(models.TextChoices):
+    FORMED = 'formed'
+    PAID = 'paid'
+    ASSEMBLING = 'assembling'
+    SHIPPED = 'shipped'
+    DELIVERED = 'delivered'
+    CANCELLED = 'cancelled'
+
+
+# Допустимые переходы статусов заказа: из статуса-ключа в перечисленные
+ORDER_STATUS_TRANSITIONS = {
+    OrderStatus.FORMED: (OrderStatus.PAID, OrderStatus.CANCELLED),
+    OrderStatus.PAID: (OrderStatus.ASSEMBLING, OrderStatus.CANCELLED),
+    OrderStatus.ASSEMBLING: (OrderStatus.SHIPPED, OrderStatus.CANCELLED),
+    OrderStatus.SHIPPED: (OrderStatus.DELIVERED,),
+    OrderStatus.DELIVERED: (),
+    OrderStatus.CANCELLED: (),
+}
+
+
+def status_sources(target):
+    """Статусы, из которых заказ можно перевести в target."""
+    return [source for source, targets in ORDER_STATUS_TRANSITIONS.items() if target in targets]
+
 
 class Order(models.Model):
     id = models.BigAutoField(primary_key=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    status = models.CharField(max_length=100, default='formed')
+    status = models.CharField(max_length=100, choices=OrderStatus.choices, default=OrderStatus.FORMED)
     price = models.IntegerField('total_price')
+    created_at = models.DateTimeField('created_at', default=timezone.now, editable=False)
+    updated_at = models.DateTimeField('updated_at', auto_now=True, db_index=True)
 
     class Meta:
         db_table = 'order'
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='order_user_created_idx'),
+            models.Index(fields=['user', 'status', 'created_at'], name='order_user_status_created_idx'),
+            models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+            models.Index(fields=['created_at', 'id'], name='order_created_idx'),
+        ]
 
 
 class OrderedProduct(models.Model):
     id = models.BigAutoField(primary_key=True)
-    order = models.ForeignKey(Order, on_delete=models.CASCADE)
+    # order партиционирована по created_at (order/partitions.py), внешний
+    # ключ на неё в БД невозможен, каскад удаления выполняет ORM
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, db_constraint=False)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     amount = models.IntegerField(default=1)
     price = models.IntegerField('ordered_product_price')
+    # Совпадает с created_at заказа, чтобы строки лежали в партиции его месяца
+    created_at = models.DateTimeField('created_at', default=timezone.now, editable=False)
+
+    class Meta:
+        db_table = 'orderedProduct'
+
+
+class ReservationStatus(models.TextChoices):
+    ACTIVE = 'active'
+    CONFIRMED = 'confirmed'
+    RELEASED = 'released'
+
+
+class StockReservation(models.Model):
+    """Товар, списанный со склада под заказ до его подтверждения или отмены"""
+
+    id = models.BigAutoField(primary_key=True)
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='reservations', db_constraint=False)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    product_storage = models.ForeignKey(ProductStorage, on_delete=models.CASCADE)
+    amount = models.IntegerField('amount')
+    status = models.CharField('status', max_length=16, choices=ReservationStatus.choices,
+                              default=ReservationStatus.ACTIVE)
+    expires_at = models.DateTimeField('expires_at')
+    created_at = models.DateTimeField('created_at', default=timezone.now, editable=False)
 
     class Meta:
-        db_table = 'orderedProduct'
\ No newline at end of file
+        db_table = 'stock_reservation'
+        indexes = [
+            models.Index(fields=['order', 'status'], name='reservation_order_idx'),
+            models.Index(fields=['expires_at'], name='reservation_expires_idx',
+                         condition=models.Q(status='active')),
+        ]
@@ -0,0 +1,323 @@
+import gzip
+import os
+import re
+from datetime import date, datetime, time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.utils import timezone
+
+# Заказы и их строки хранятся помесячно: таблица на каждый месяц по created_at
+# и партиция по умолчанию для строк вне созданных месяцев. Строка заказа
+# получает created_at своего заказа, поэтому заказ и его строки всегда лежат
+# в партициях одного месяца и архивируются вместе.
+PARTITIONED_TABLES = ('order', 'orderedProduct')
+
+PARTITION_NAME_RE = re.compile(r'^(?P<table>order|orderedProduct)_(?P<year>\d{4})_(?P<month>\d{2})$')
+
+ARCHIVE_SUFFIX = '.csv.gz'
+
+ARCHIVE_CHUNK_SIZE = 1 << 20
+
+PARTITION_MONTHS_SQL = """
+    SELECT child.relname
+    FROM pg_inherits
+    JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+    WHERE pg_inherits.inhparent = %s::regclass
+"""
+
+DEFAULT_MONTHS_SQL = """
+    SELECT DISTINCT date_trunc('month', created_at AT TIME ZONE %s)::date FROM {default}
+"""
+
+BACKFILL_LINES_SQL = """
+    UPDATE "orderedProduct" l SET created_at = o.created_at
+    FROM "order" o
+    WHERE o.id = l.order_id AND l.created_at <> o.created_at
+"""
+
+
+def quote(name):
+    return connection.ops.quote_name(name)
+
+
+def month_start(moment=None):
+    """Первое число месяца, в который попадает moment (по умолчанию - сейчас)."""
+    moment = timezone.localtime(moment)
+    return date(moment.year, moment.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def parse_month(value):
+    """YYYY-MM -> первое число месяца. ValueError при неверном формате."""
+    return datetime.strptime(value, '%Y-%m').date()
+
+
+def partition_name(table, month):
+    return f'{table}_{month:%Y_%m}'
+
+
+def default_partition_name(table):
+    return f'{table}_default'
+
+
+def _bound(month):
+    moment = datetime.combine(month, time.min, tzinfo=timezone.get_current_timezone())
+    return f"'{moment.isoformat()}'"
+
+
+def _range_condition(month):
+    return f'created_at >= {_bound(month)} AND created_at < {_bound(add_months(month, 1))}'
+
+
+def _table_exists(cursor, name):
+    cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [quote(name)])
+    return cursor.fetchone()[0]
+
+
+def is_partitioned(cursor, table):
+    cursor.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(%s)", [quote(table)])
+    row = cursor.fetchone()
+    return bool(row and row[0])
+
+
+def list_partitions(cursor, table):
+    """Месячные партиции таблицы: {первое число месяца: имя партиции}."""
+    cursor.execute(PARTITION_MONTHS_SQL, [quote(table)])
+    months = {}
+    for (name,) in cursor.fetchall():
+        match = PARTITION_NAME_RE.match(name)
+        if match:
+            months[date(int(match['year']), int(match['month']), 1)] = name
+    return months
+
+
+def _attach(cursor, table, month, load=None):
+    """
+    Создаёт партицию месяца отдельной таблицей, заполняет её (load и строки
+    этого месяца из партиции по умолчанию) и подключает к таблице. Индексы
+    партиционированной таблицы создаются на партиции при подключении.
+    """
+    name = quote(partition_name(table, month))
+    cursor.execute(f'CREATE TABLE {name} (LIKE {quote(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+    if load is not None:
+        load(cursor, name)
+    _attach_existing(cursor, table, month)
+
+
+def _attach_existing(cursor, table, month):
+    # Пока в партиции по умолчанию есть строки месяца, подключить его нельзя
+    name = quote(partition_name(table, month))
+    cursor.execute(f'WITH moved AS (DELETE FROM {quote(default_partition_name(table))} '
+                   f'WHERE {_range_condition(month)} RETURNING *) INSERT INTO {name} SELECT * FROM moved')
+    cursor.execute(f'ALTER TABLE {quote(table)} ATTACH PARTITION {name} '
+                   f'FOR VALUES FROM ({_bound(month)}) TO ({_bound(add_months(month, 1))})')
+
+
+def _months_in_default(cursor, table):
+    cursor.execute(DEFAULT_MONTHS_SQL.format(default=quote(default_partition_name(table))),
+                   [timezone.get_current_timezone_name()])
+    return {row[0] for row in cursor.fetchall()}
+
+
+def ensure_partitions(cursor, ahead=None):
+    """
+    Создаёт партиции с текущего месяца на ahead месяцев вперёд и для месяцев,
+    строки которых попали в партицию по умолчанию. Возвращает имена созданных.
+    """
+    if ahead is None:
+        ahead = settings.ORDER_PARTITION_AHEAD_MONTHS
+    current = month_start()
+    created = []
+    for table in PARTITIONED_TABLES:
+        existing = list_partitions(cursor, table)
+        months = {add_months(current, offset) for offset in range(ahead + 1)}
+        months |= _months_in_default(cursor, table)
+        for month in sorted(months - existing.keys()):
+            _attach(cursor, table, month)
+            created.append(partition_name(table, month))
+    return created
+
+
+def extend_partitions(ahead=None, using=DEFAULT_DB_ALIAS):
+    """
+    Добавляет партиции на следующие месяцы, если таблицы уже разбиты; таблицы
+    не преобразует. Возвращает имена созданных партиций.
+    """
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        if not all(is_partitioned(cursor, table) for table in PARTITIONED_TABLES):
+            return []
+        return ensure_partitions(cursor, ahead)
+
+
+def install_partitions(sender, using, **kwargs):
+    """Добавляет партиции на следующие месяцы при migrate (post_migrate приложения order)."""
+    extend_partitions(using=using)
+
+
+def _convert(cursor, table):
+    """
+    Пересоздаёт таблицу партиционированной по месяцам created_at и переносит
+    в неё строки. Первичный ключ становится (id, created_at): уникальный ключ
+    партиционированной таблицы обязан содержать ключ разбиения.
+    """
+    quoted = quote(table)
+    legacy = quote(f'{table}_legacy')
+
+    cursor.execute('SELECT pg_get_indexdef(indexrelid) FROM pg_index '
+                   'WHERE indrelid = %s::regclass AND NOT indisprimary', [quoted])
+    indexes = [row[0] for row in cursor.fetchall()]
+    cursor.execute("SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+                   "WHERE conrelid = %s::regclass AND contype = 'f'", [quoted])
+    foreign_keys = cursor.fetchall()
+    cursor.execute(f'SELECT MIN(created_at) FROM {quoted}')
+    oldest = cursor.fetchone()[0]
+
+    cursor.execute(f'ALTER TABLE {quoted} RENAME TO {legacy}')
+    cursor.execute(f'CREATE TABLE {quoted} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+                   f'PARTITION BY RANGE (created_at)')
+    cursor.execute(f'CREATE TABLE {quote(default_partition_name(table))} PARTITION OF {quoted} DEFAULT')
+
+    month = month_start(oldest) if oldest else month_start()
+    while month <= month_start():
+        _attach(cursor, table, month)
+        month = add_months(month, 1)
+
+    cursor.execute(f'INSERT INTO {quoted} SELECT * FROM {legacy}')
+    cursor.execute(f'DROP TABLE {legacy}')
+
+    # Индексы и внешние ключи создаются после загрузки и после удаления
+    # старой таблицы, чьи имена они занимали
+    cursor.execute(f'ALTER TABLE {quoted} ADD PRIMARY KEY (id, created_at)')
+    for definition in indexes:
+        cursor.execute(definition)
+    for name, definition in foreign_keys:
+        cursor.execute(f'ALTER TABLE {quoted} ADD CONSTRAINT {quote(name)} {definition}')
+
+    # Столбец identity не переносится в партиционированную таблицу,
+    # id продолжает выдавать обычная последовательность
+    sequence = quote(f'{table}_id_seq')
+    cursor.execute(f'CREATE SEQUENCE {sequence} OWNED BY {quoted}.id')
+    cursor.execute(f"SELECT setval('{sequence}', COALESCE(MAX(id), 0) + 1, false) FROM {quoted}")
+    cursor.execute(f"ALTER TABLE {quoted} ALTER COLUMN id SET DEFAULT nextval('{sequence}')")
+
+
+def partition_tables(ahead=None):
+    """
+    Переводит order и orderedProduct на помесячные партиции, если это ещё
+    не сделано, и создаёт партиции наперёд. Таблицы заблокированы на всё
+    время переноса. Возвращает список преобразованных таблиц и созданных партиций.
+    """
+    converted = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Отложенные проверки внешних ключей не дают менять таблицы в транзакции
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        pending = [table for table in PARTITIONED_TABLES if not is_partitioned(cursor, table)]
+        if pending:
+            cursor.execute('LOCK TABLE {} IN ACCESS EXCLUSIVE MODE'.format(
+                ', '.join(quote(table) for table in PARTITIONED_TABLES)))
+            cursor.execute(BACKFILL_LINES_SQL)
+
+            # На партиционированную таблицу нельзя сослаться по одному id,
+            # ссылки на заказы проверяет ORM (ForeignKey с db_constraint=False)
+            cursor.execute("SELECT conrelid::regclass::text, conname FROM pg_constraint "
+                           "WHERE confrelid = ANY(%s::regclass[]) AND contype = 'f'",
+                           [[quote(table) for table in pending]])
+            for relation, name in cursor.fetchall():
+                cursor.execute(f'ALTER TABLE {relation} DROP CONSTRAINT {quote(name)}')
+
+            for table in pending:
+                _convert(cursor, table)
+                converted.append(table)
+        created = ensure_partitions(cursor, ahead)
+    return converted, created
+
+
+def archive_path(directory, table, month):
+    return os.path.join(directory, partition_name(table, month) + ARCHIVE_SUFFIX)
+
+
+def archive_month(month, directory=None, detach_only=False):
+    """
+    Отключает партиции заказов и строк за месяц. Без detach_only партиции
+    выгружаются в directory сжатым CSV (с заголовком) и удаляются; резервы
+    этих заказов удаляются вместе с ними. Возвращает пути к архивам
+    (или имена отключённых таблиц).
+    """
+    directory = directory or settings.ORDER_ARCHIVE_DIR
+    result = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        orders = quote(partition_name('order', month))
+        if not detach_only:
+            cursor.execute(f'DELETE FROM stock_reservation r USING {orders} o WHERE r.order_id = o.id')
+
+        for table in PARTITIONED_TABLES:
+            name = quote(partition_name(table, month))
+            cursor.execute(f'ALTER TABLE {quote(table)} DETACH PARTITION {name}')
+            if detach_only:
+                result.append(partition_name(table, month))
+                continue
+
+            os.makedirs(directory, exist_ok=True)
+            path = archive_path(directory, table, month)
+            with gzip.open(path + '.tmp', 'wb') as file:
+                with cursor.copy(f'COPY {name} TO STDOUT (FORMAT csv, HEADER)') as copy:
+                    for data in copy:
+                        file.write(data)
+            os.replace(path + '.tmp', path)
+            cursor.execute(f'DROP TABLE {name}')
+            result.append(path)
+    return result
+
+
+def archivable_months(before):
+    """Месяцы раньше before, партиции которых есть у обеих таблиц."""
+    with connection.cursor() as cursor:
+        months = [set(list_partitions(cursor, table)) for table in PARTITIONED_TABLES]
+    return sorted(month for month in set.intersection(*months) if month < before)
+
+
+def _load_archive(path):
+    def load(cursor, name):
+        with gzip.open(path, 'rb') as file:
+            # Столбцы берутся из заголовка: таблица могла получить новые
+            # столбцы после архивации, они заполнятся значениями по умолчанию
+            columns = file.readline().decode().strip().split(',')
+            with cursor.copy(f'COPY {name} ({", ".join(quote(column) for column in columns)}) '
+                             f'FROM STDIN (FORMAT csv)') as copy:
+                while data := file.read(ARCHIVE_CHUNK_SIZE):
+                    copy.write(data)
+    return load
+
+
+def restore_archive(path):
+    """Загружает архив партиции обратно и подключает его. Возвращает имя партиции."""
+    filename = os.path.basename(path)
+    match = PARTITION_NAME_RE.match(filename.removesuffix(ARCHIVE_SUFFIX))
+    if not filename.endswith(ARCHIVE_SUFFIX) or not match:
+        raise ValueError(f'Имя файла не похоже на архив партиции: {filename}')
+    table, month = match['table'], date(int(match['year']), int(match['month']), 1)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        if _table_exists(cursor, partition_name(table, month)):
+            raise ValueError(f'Партиция {partition_name(table, month)} уже существует')
+        _attach(cursor, table, month, load=_load_archive(path))
+    return partition_name(table, month)
+
+
+def reattach_month(month):
+    """Подключает обратно партиции месяца, отключённые без архивации."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        for table in PARTITIONED_TABLES:
+            name = partition_name(table, month)
+            if not _table_exists(cursor, name):
+                raise ValueError(f'Таблица {name} не найдена')
+            if month in list_partitions(cursor, table):
+                raise ValueError(f'Партиция {name} уже подключена')
+        for table in PARTITIONED_TABLES:
+            _attach_existing(cursor, table, month)
+    return [partition_name(table, month) for table in PARTITIONED_TABLES]
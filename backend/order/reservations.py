@@ -0,0 +1,175 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from backend.cache import invalidate_tags
+from catalog.models import Product
+from order.models import Order, OrderedProduct, ReservationStatus, StockReservation
+from storage.models import ProductStorage
+
+RELEASE_SQL = """
+    UPDATE stock_reservation SET status = 'released'
+    WHERE status = 'active' AND {condition}
+    RETURNING product_id, product_storage_id, amount
+"""
+
+RESTORE_STOCK_SQL = """
+    UPDATE product_storage
+    SET count_product = product_storage.count_product + released.amount
+    FROM unnest(%s::bigint[], %s::integer[]) AS released (id, amount)
+    WHERE product_storage.id = released.id
+"""
+
+
+class InsufficientStock(Exception):
+    """На складах не хватает товара; shortages - {id товара: недостающее количество}"""
+
+    def __init__(self, shortages):
+        super().__init__(shortages)
+        self.shortages = shortages
+
+
+def lock_products(ids):
+    """
+    Блокирует товары в порядке id. Триггер остатков всё равно блокирует строку
+    товара до конца транзакции, а общий порядок блокировок исключает взаимные
+    блокировки между резервированием и возвратом нескольких товаров.
+    """
+    list(Product.objects.select_for_update().filter(id__in=ids).order_by('id').values_list('id', flat=True))
+
+
+def reserve_stock(order, lines):
+    """
+    Списывает со складов товар заказа и записывает резервы со сроком жизни
+    STOCK_RESERVATION_TTL. lines - {id товара: количество}.
+
+    Товары и их записи на складах блокируются select_for_update в порядке id,
+    поэтому одновременные заказы одного товара выполняются по очереди и не
+    могут списать больше, чем есть. Количество берётся сначала со складов с
+    наибольшим остатком. Если товара не хватает, ничего не списывается и
+    выбрасывается InsufficientStock.
+    """
+    lines = {product: amount for product, amount in lines.items() if amount > 0}
+    if not lines:
+        return []
+
+    expires_at = timezone.now() + timedelta(seconds=settings.STOCK_RESERVATION_TTL)
+    with transaction.atomic():
+        lock_products(lines)
+        stock = (ProductStorage.objects
+                 .select_for_update()
+                 .filter(product_id__in=lines, count_product__gt=0)
+                 .order_by('id')
+                 .only('id', 'product_id', 'count_product'))
+
+        by_product = {}
+        for product_storage in stock:
+            by_product.setdefault(product_storage.product_id, []).append(product_storage)
+
+        changed = []
+        reservations = []
+        shortages = {}
+        for product, amount in lines.items():
+            remaining = amount
+            for product_storage in sorted(by_product.get(product, []), key=lambda row: -row.count_product):
+                if not remaining:
+                    break
+                taken = min(product_storage.count_product, remaining)
+                product_storage.count_product -= taken
+                remaining -= taken
+                changed.append(product_storage)
+                reservations.append(StockReservation(order=order, product_id=product,
+                                                     product_storage_id=product_storage.id,
+                                                     amount=taken, expires_at=expires_at))
+            if remaining:
+                shortages[product] = remaining
+
+        if shortages:
+            raise InsufficientStock(shortages)
+
+        ProductStorage.objects.bulk_update(changed, ['count_product'])
+        reservations = StockReservation.objects.bulk_create(reservations)
+        invalidate_tags('product_storage', 'product')
+    return reservations
+
+
+def reserve_missing_stock(order_ids):
+    """
+    Дорезервирует товар заказов, строки которых не покрыты действующими
+    (active или confirmed) резервами - например, резерв истёк, пока заказ
+    ждал оплаты. Действующие резервы блокируются до конца транзакции:
+    параллельное снятие истёкших резервов либо завершится раньше и будет
+    учтено здесь, либо дождётся подтверждения и ничего не снимет.
+    Возвращает {id заказа: shortages} для заказов, которым не хватило товара;
+    им ничего не резервируется.
+    """
+    order_ids = sorted(set(order_ids))
+    if not order_ids:
+        return {}
+
+    with transaction.atomic():
+        held = {}
+        for order_id, product, amount in (StockReservation.objects
+                                          .select_for_update()
+                                          .filter(order_id__in=order_ids,
+                                                  status__in=[ReservationStatus.ACTIVE, ReservationStatus.CONFIRMED])
+                                          .order_by('id')
+                                          .values_list('order_id', 'product_id', 'amount')):
+            held[order_id, product] = held.get((order_id, product), 0) + amount
+
+        missing = {}
+        for order_id, product, amount in (OrderedProduct.objects
+                                          .filter(order_id__in=order_ids)
+                                          .values_list('order_id', 'product_id', 'amount')):
+            lines = missing.setdefault(order_id, {})
+            lines[product] = lines.get(product, 0) + amount
+        for order_id, lines in missing.items():
+            for product in lines:
+                lines[product] -= held.get((order_id, product), 0)
+
+        failed = {}
+        orders = Order.objects.in_bulk([order_id for order_id, lines in missing.items()
+                                        if any(amount > 0 for amount in lines.values())])
+        for order_id in sorted(orders):
+            try:
+                reserve_stock(orders[order_id], missing[order_id])
+            except InsufficientStock as error:
+                failed[order_id] = error.shortages
+    return failed
+
+
+def _release(condition, params):
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(RELEASE_SQL.format(condition=condition), params)
+        released = cursor.fetchall()
+        if not released:
+            return 0
+
+        totals = {}
+        for _, product_storage, amount in released:
+            totals[product_storage] = totals.get(product_storage, 0) + amount
+        lock_products({product for product, _, _ in released})
+
+        ids = sorted(totals)
+        cursor.execute(RESTORE_STOCK_SQL, [ids, [totals[pk] for pk in ids]])
+        invalidate_tags('product_storage', 'product')
+    return len(released)
+
+
+def release_order_reservations(order_ids):
+    """Возвращает на склады активные резервы заказов. Повторный вызов ничего не меняет."""
+    return _release('order_id = ANY(%s)', [list(order_ids)])
+
+
+def release_expired_reservations():
+    """Возвращает на склады резервы, срок которых истёк. Возвращает число снятых резервов."""
+    return _release('expires_at < %s', [timezone.now()])
+
+
+def confirm_order_reservations(order_ids):
+    """Закрепляет резервы заказов: после подтверждения они больше не истекают."""
+    return (StockReservation.objects
+            .filter(order_id__in=order_ids, status=ReservationStatus.ACTIVE)
+            .update(status=ReservationStatus.CONFIRMED))
@@ -1,5 +1,14 @@
+from django.db import transaction
 from rest_framework import serializers
-from .models import Order, OrderedProduct
+
+from analytics.rollups import apply_orders
+from catalog.models import Product
+from catalog.serializers import ProductSummarySerializer
+from user.models import User
+from .models import ORDER_STATUS_TRANSITIONS, Order, OrderedProduct, OrderStatus, StockReservation
+from .reservations import confirm_order_reservations, reserve_stock
+
+ORDER_LINES_PREFETCH = 'orderedproduct_set__product'
 
 class OrderSerializer(serializers.ModelSerializer):
     class Meta:
@@ -7,9 +16,92 @@ class OrderSerializer(serializers.ModelSerializer):
 
         fields = '__all__'
 
+    def validate_status(self, value):
+        if self.instance is not None and value != self.instance.status and \
+                value not in ORDER_STATUS_TRANSITIONS.get(self.instance.status, ()):
+            raise serializers.ValidationError(f'Переход из статуса {self.instance.status} в {value} недопустим')
+        return value
+
 
 class OrderedProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = OrderedProduct
 
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+
+class StockReservationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = StockReservation
+
+        fields = '__all__'
+
+
+class OrderedProductDetailSerializer(serializers.ModelSerializer):
+    product = ProductSummarySerializer(read_only=True)
+
+    class Meta:
+        model = OrderedProduct
+
+        exclude = ('order',)
+
+
+class OrderWithLinesSerializer(serializers.ModelSerializer):
+    """Заказ со строками; queryset должен включать prefetch_related(ORDER_LINES_PREFETCH)"""
+
+    lines = OrderedProductDetailSerializer(source='orderedproduct_set', many=True, read_only=True)
+
+    class Meta:
+        model = Order
+
+        fields = '__all__'
+
+
+class OrderLineSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    amount = serializers.IntegerField(min_value=1, default=1)
+
+
+class OrderCreateSerializer(serializers.Serializer):
+    """
+    Оформление заказа одним запросом: заказ, его строки и резерв товара на
+    складах создаются в одной транзакции. Цены берутся из Product.price
+    одним запросом, стоимость заказа считается на сервере.
+    """
+    user = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
+    status = serializers.ChoiceField(choices=[OrderStatus.FORMED, OrderStatus.PAID], default=OrderStatus.FORMED)
+    products = OrderLineSerializer(many=True, allow_empty=False)
+
+    def validate_products(self, lines):
+        amounts = {}
+        for line in lines:
+            # Повторы одного товара объединяются в одну строку
+            amounts[line['product']] = amounts.get(line['product'], 0) + line['amount']
+
+        prices = dict(Product.objects.filter(id__in=amounts).values_list('id', 'price'))
+        missing = sorted(set(amounts) - set(prices))
+        if missing:
+            raise serializers.ValidationError(f'Товары не найдены: {", ".join(map(str, missing))}')
+        return [{'product': product, 'amount': amount, 'price': prices[product]}
+                for product, amount in amounts.items()]
+
+    def create(self, validated_data):
+        lines = validated_data['products']
+        with transaction.atomic():
+            order = Order.objects.create(
+                user=validated_data['user'],
+                status=validated_data['status'],
+                price=sum(line['price'] * line['amount'] for line in lines),
+            )
+            OrderedProduct.objects.bulk_create([
+                OrderedProduct(order=order, product_id=line['product'], amount=line['amount'], price=line['price'],
+                               created_at=order.created_at)
+                for line in lines
+            ])
+            # bulk_create не отправляет сигналы, сводки продаж обновляются явно
+            apply_orders([order.id])
+            reserve_stock(order, {line['product']: line['amount'] for line in lines})
+            # Резерв оплаченного заказа не должен истечь (post_save пропускает созданные заказы)
+            if order.status != OrderStatus.FORMED:
+                confirm_order_reservations([order.id])
+        return order
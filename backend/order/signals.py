@@ -0,0 +1,84 @@
+from django.db.models.signals import post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from analytics.rollups import apply_lines, apply_orders
+from order.models import Order, OrderedProduct, OrderStatus
+from order.reservations import InsufficientStock, confirm_order_reservations, release_order_reservations
+from order.reservations import reserve_missing_stock
+
+
+@receiver(pre_save, sender=Order)
+def order_remember_status(sender, instance, **kwargs):
+    instance._old_status = None
+    instance._sales_moved = False
+    if instance.pk is None:
+        return
+
+    old = Order.objects.filter(pk=instance.pk).values_list('status', 'created_at').first()
+    if old is None:
+        return
+    instance._old_status, old_created_at = old
+
+    # Резерв мог истечь, пока заказ ждал: перед подтверждением товар
+    # дорезервируется, а если его нет - заказ не сохраняется
+    if instance._old_status == OrderStatus.FORMED and \
+            instance.status not in (OrderStatus.FORMED, OrderStatus.CANCELLED):
+        failed = reserve_missing_stock([instance.pk])
+        if failed:
+            raise InsufficientStock(failed[instance.pk])
+
+    # Отмена, её снятие или смена даты заказа переносят продажи в сводках:
+    # вычитаются сейчас по старому состоянию, прибавляются после сохранения
+    was_cancelled = instance._old_status == OrderStatus.CANCELLED
+    if was_cancelled != (instance.status == OrderStatus.CANCELLED) or old_created_at != instance.created_at:
+        apply_orders([instance.pk], sign=-1)
+        instance._sales_moved = True
+
+
+@receiver(post_save, sender=Order)
+def order_update_reservations(sender, instance, created, **kwargs):
+    old_status = getattr(instance, '_old_status', None)
+    if created or old_status == instance.status:
+        return
+    if instance.status == OrderStatus.CANCELLED:
+        release_order_reservations([instance.pk])
+    elif old_status == OrderStatus.FORMED:
+        confirm_order_reservations([instance.pk])
+
+
+@receiver(post_save, sender=Order)
+def order_update_sales(sender, instance, created, **kwargs):
+    if getattr(instance, '_sales_moved', False):
+        apply_orders([instance.pk])
+
+
+@receiver(pre_delete, sender=Order)
+def order_release_reservations(sender, instance, **kwargs):
+    # Резервы удаляются каскадом, товар нужно вернуть на склады до этого.
+    # Продажи из сводок вычитают строки заказа, которые удаляются раньше него
+    release_order_reservations([instance.pk])
+
+
+@receiver(pre_save, sender=OrderedProduct)
+def ordered_product_order_created_at(sender, instance, **kwargs):
+    # Строка хранится в партиции месяца своего заказа
+    if instance._state.adding:
+        created_at = Order.objects.filter(pk=instance.order_id).values_list('created_at', flat=True).first()
+        if created_at is not None:
+            instance.created_at = created_at
+
+
+@receiver(pre_save, sender=OrderedProduct)
+def ordered_product_subtract_sales(sender, instance, **kwargs):
+    if instance.pk is not None:
+        apply_lines([instance.pk], sign=-1)
+
+
+@receiver(post_save, sender=OrderedProduct)
+def ordered_product_add_sales(sender, instance, **kwargs):
+    apply_lines([instance.pk])
+
+
+@receiver(pre_delete, sender=OrderedProduct)
+def ordered_product_delete_sales(sender, instance, **kwargs):
+    apply_lines([instance.pk], sign=-1)
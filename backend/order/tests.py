@@ -0,0 +1,258 @@
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+from datetime import timedelta
+from io import StringIO
+import json
+import os
+import tempfile
+from user.serializers import UserSerializer
+
+from catalog.models import Product
+from order.models import Order, OrderedProduct, StockReservation
+from order.reservations import release_expired_reservations
+from order.partitions import add_months, extend_partitions, is_partitioned, month_start, partition_name
+from storage.models import ProductStorage, Storage
+
+
+class OrderTest(TestCase):
+    def setUp(self):
+        json_user_body = {
+            'email':'user@mail.ru',
+            'name':'username',
+            'password':'pass'
+        }
+        serializer =UserSerializer(data=json_user_body)
+        serializer.is_valid(raise_exception=True)
+        self.user = serializer.save()
+        json_login_body = {
+            'email':'user@mail.ru',
+            'password':'pass'
+        }
+        response = self.client.post('/login/', json.dumps(json_login_body), content_type="application/json")
+        cookies = response.cookies.get('jwt').value
+        self.client.defaults['HTTP_AUTHORIZATION'] = 'Bearer ' + cookies
+
+        storage = Storage.objects.create(name='north', location='Moscow')
+        self.helmet = Product.objects.create(name='helmet', price=100)
+        self.boots = Product.objects.create(name='boots', price=250)
+        ProductStorage.objects.create(storage=storage, product=self.helmet, count_product=10)
+        ProductStorage.objects.create(storage=storage, product=self.boots, count_product=1)
+
+    def test_order_create_with_lines(self):
+        json_order = {
+            'user':self.user.id,
+            'price':1,
+            'products':[
+                {'product':self.helmet.id, 'amount':2},
+                {'product':self.boots.id},
+                {'product':self.helmet.id, 'amount':1},
+            ]
+        }
+        response = self.client.post('/order/', json.dumps(json_order), content_type="application/json")
+        self.assertEqual(response.status_code,201)
+        self.assertEqual(response.data['price'], 550)
+        self.assertEqual(len(response.data['lines']), 2)
+        self.helmet.refresh_from_db()
+        self.assertEqual(self.helmet.count, 7)
+        print('order create with lines done')
+
+        #out of stock
+        json_order['products'] = [{'product':self.boots.id}]
+        response = self.client.post('/order/', json.dumps(json_order), content_type="application/json")
+        self.assertEqual(response.status_code,409)
+        self.assertEqual(Order.objects.count(), 1)
+
+        #unknown product
+        json_order['products'] = [{'product':self.boots.id + 100}]
+        response = self.client.post('/order/', json.dumps(json_order), content_type="application/json")
+        self.assertEqual(response.status_code,400)
+        self.assertEqual(OrderedProduct.objects.count(), 2)
+        print('order create errors done')
+
+        #paid at creation: reservation never expires
+        json_order['products'] = [{'product':self.helmet.id}]
+        json_order['status'] = 'paid'
+        response = self.client.post('/order/', json.dumps(json_order), content_type="application/json")
+        self.assertEqual(response.status_code,201)
+        self.assertEqual(list(StockReservation.objects.filter(order_id=response.data['id'])
+                              .values_list('status', flat=True)), ['confirmed'])
+
+    def test_order_history(self):
+        for amount in range(1, 4):
+            json_order = {'user':self.user.id, 'products':[{'product':self.helmet.id, 'amount':amount}]}
+            self.client.post('/order/', json.dumps(json_order), content_type="application/json")
+
+        response = self.client.get('/orders/', {'user':self.user.id, 'limit':2, 'include':'lines'})
+        self.assertEqual(response.status_code,200)
+        self.assertEqual([order['lines'][0]['amount'] for order in response.data['results']], [3, 2])
+        self.assertEqual(response.data['results'][0]['lines'][0]['product']['name'], 'helmet')
+
+        response = self.client.get('/orders/', {'cursor':response.data['next'], 'limit':2})
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['next'])
+
+        response = self.client.get('/orders/order_by_user/', {'user_id':self.user.id})
+        self.assertEqual(response.status_code,200)
+        self.assertEqual(len(response.data['results']), 3)
+
+        response = self.client.get('/orders/', {'created_from':'2000-01-01', 'created_to':'2000-01-01'})
+        self.assertEqual(response.data['results'], [])
+        response = self.client.get('/orders/', {'created_from':'yesterday'})
+        self.assertEqual(response.status_code,400)
+
+        #orders are created through /order/ only, where the price is computed
+        json_order = {'user':self.user.id, 'price':1, 'status':'formed'}
+        response = self.client.post('/orders/', json.dumps(json_order), content_type="application/json")
+        self.assertEqual(response.status_code,405)
+        response = self.client.delete('/orders/{0}/'.format(Order.objects.first().id))
+        self.assertEqual(response.status_code,405)
+        print('order history done')
+
+    def test_order_export(self):
+        json_order = {'user':self.user.id, 'products':[{'product':self.helmet.id}]}
+        order_id = self.client.post('/order/', json.dumps(json_order), content_type="application/json").data['id']
+
+        response = self.client.get('/order/export/')
+        self.assertEqual(response.status_code,200)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,user,status,price,created_at')
+        self.assertTrue(lines[1].startswith('{0},{1},formed,100,'.format(order_id, self.user.id)))
+
+        response = self.client.get('/order/export/', {'export_format':'ndjson'})
+        row = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(row['created_at'], str(Order.objects.get(pk=order_id).created_at))
+        print('order export done')
+
+    def test_order_bulk_status(self):
+        ids = []
+        for _ in range(3):
+            json_order = {'user':self.user.id, 'products':[{'product':self.helmet.id, 'amount':2}]}
+            response = self.client.post('/order/', json.dumps(json_order), content_type="application/json")
+            ids.append(response.data['id'])
+        Order.objects.filter(pk=ids[2]).update(status='delivered')
+
+        json_body = {'ids':ids + [ids[2] + 100], 'status':'cancelled'}
+        response = self.client.post('/order/status/', json.dumps(json_body), content_type="application/json")
+        self.assertEqual(response.status_code,200)
+        self.assertEqual(response.data['updated'], ids[:2])
+        self.assertEqual(response.data['rejected'], [{'id':ids[2], 'status':'delivered'},
+                                                     {'id':ids[2] + 100, 'status':None}])
+        self.helmet.refresh_from_db()
+        self.assertEqual(self.helmet.count, 8)
+
+        #single transition is validated too
+        response = self.client.put('/order/{0}/'.format(ids[0]), json.dumps({'status':'paid'}),
+                                   content_type="application/json")
+        self.assertEqual(response.status_code,400)
+
+        response = self.client.post('/order/status/', json.dumps({'ids':ids, 'status':'lost'}),
+                                    content_type="application/json")
+        self.assertEqual(response.status_code,400)
+        print('order bulk status done')
+
+    def test_order_stock_reservation(self):
+        product = Product.objects.create(name='scarf', brand='gucci')
+        first = Storage.objects.create(name='north', location='Moscow')
+        second = Storage.objects.create(name='south', location='Sochi')
+        ProductStorage.objects.create(storage=first, product=product, count_product=2)
+        ProductStorage.objects.create(storage=second, product=product, count_product=3)
+
+        order = Order.objects.create(user=self.user, price=100)
+        OrderedProduct.objects.create(order=order, product=product, amount=4, price=25)
+        response = self.client.post('/order/{0}/reservations/'.format(order.id))
+        self.assertEqual(response.status_code,201)
+        self.assertEqual(sorted(row['amount'] for row in response.data), [1, 3])
+        product.refresh_from_db()
+        self.assertEqual(product.count, 1)
+
+        other = Order.objects.create(user=self.user, price=100)
+        OrderedProduct.objects.create(order=other, product=product, amount=2, price=25)
+        response = self.client.post('/order/{0}/reservations/'.format(other.id))
+        self.assertEqual(response.status_code,409)
+        self.assertEqual(response.data['shortages'], {product.id: 1})
+
+        order.status = 'cancelled'
+        order.save()
+        product.refresh_from_db()
+        self.assertEqual(product.count, 5)
+
+        response = self.client.post('/order/{0}/reservations/'.format(other.id))
+        self.assertEqual(response.status_code,201)
+        StockReservation.objects.filter(order=other).update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(release_expired_reservations(), 1)
+        product.refresh_from_db()
+        self.assertEqual(product.count, 5)
+        print('order stock reservation done')
+
+    def test_order_paid_after_reservation_expired(self):
+        ids = []
+        for _ in range(2):
+            json_order = {'user':self.user.id, 'products':[{'product':self.helmet.id, 'amount':4}]}
+            response = self.client.post('/order/', json.dumps(json_order), content_type="application/json")
+            ids.append(response.data['id'])
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(release_expired_reservations(), 2)
+
+        response = self.client.put('/order/{0}/'.format(ids[0]), json.dumps({'status':'paid'}),
+                                   content_type="application/json")
+        self.assertEqual(response.status_code,200)
+        self.assertEqual(list(StockReservation.objects.filter(order_id=ids[0], status='confirmed')
+                              .values_list('amount', flat=True)), [4])
+        self.helmet.refresh_from_db()
+        self.assertEqual(self.helmet.count, 6)
+
+        #stock was sold meanwhile
+        self.client.put('/productStorage/{0}/'.format(self.helmet.productstorage_set.get().id),
+                        json.dumps({'count_product':3}), content_type="application/json")
+        response = self.client.post('/order/status/', json.dumps({'ids':ids[1:], 'status':'paid'}),
+                                    content_type="application/json")
+        self.assertEqual(response.data['updated'], [])
+        self.assertEqual(response.data['rejected'], [{'id':ids[1], 'status':'formed',
+                                                      'shortages':{self.helmet.id: 1}}])
+        response = self.client.put('/order/{0}/'.format(ids[1]), json.dumps({'status':'paid'}),
+                                   content_type="application/json")
+        self.assertEqual(response.status_code,409)
+        self.assertEqual(Order.objects.get(pk=ids[1]).status, 'formed')
+        print('order paid after expiry done')
+
+    def test_order_partitions(self):
+        old = Order.objects.create(user=self.user, price=100, created_at=timezone.now() - timedelta(days=800))
+        OrderedProduct.objects.create(order=old, product=self.helmet, price=100)
+        self.assertEqual(extend_partitions(), [])
+        call_command('partition_orders', stdout=StringIO())
+        with connection.cursor() as cursor:
+            self.assertTrue(is_partitioned(cursor, 'order'))
+            self.assertTrue(is_partitioned(cursor, 'orderedProduct'))
+        self.assertEqual(OrderedProduct.objects.get(order=old).created_at, old.created_at)
+        #order-partitioner keeps partitions ahead of new orders
+        self.assertIn(partition_name('order', add_months(month_start(), 5)), extend_partitions(ahead=5))
+
+        json_order = {'user':self.user.id, 'products':[{'product':self.helmet.id}]}
+        response = self.client.post('/order/', json.dumps(json_order), content_type="application/json")
+        self.assertEqual(response.status_code,201)
+        self.assertGreater(response.data['id'], old.id)
+
+        #history reads only recent months unless created_from is given
+        response = self.client.get('/orders/', {'limit':10})
+        self.assertEqual(len(response.data['results']), 1)
+        response = self.client.get('/orders/', {'limit':10, 'created_from':'2000-01-01'})
+        self.assertEqual(len(response.data['results']), 2)
+        response = self.client.get('/order/')
+        self.assertEqual(len(response.data), 1)
+        response = self.client.get('/ordersUser/{0}/'.format(self.user.id), {'created_from':'2000-01-01'})
+        self.assertEqual(len(response.data), 2)
+        print('order partitions done')
+
+        with tempfile.TemporaryDirectory() as directory:
+            before = add_months(month_start(old.created_at), 1)
+            call_command('archive_orders', before=before.strftime('%Y-%m'), directory=directory,
+                         stdout=StringIO())
+            self.assertFalse(Order.objects.filter(pk=old.pk).exists())
+            files = sorted(os.path.join(directory, name) for name in os.listdir(directory))
+            self.assertEqual(len(files), 2)
+
+            call_command('restore_orders', *files, stdout=StringIO())
+        self.assertEqual(OrderedProduct.objects.get(order=old).amount, 1)
+        print('order archive done')
@@ -0,0 +1,64 @@
+from django.db import connection, transaction
+
+from analytics.rollups import apply_orders
+from order.models import Order, OrderStatus, status_sources
+from order.reservations import confirm_order_reservations, release_order_reservations, reserve_missing_stock
+
+# Заказы блокируются в порядке id, условие на статус перепроверяется после
+# ожидания блокировки, поэтому параллельные переходы не нарушают граф статусов
+BULK_TRANSITION_SQL = """
+    WITH locked AS (
+        SELECT id FROM "order"
+        WHERE id = ANY(%(ids)s) AND status = ANY(%(sources)s)
+        ORDER BY id
+        FOR UPDATE
+    )
+    UPDATE "order" SET status = %(status)s, updated_at = now()
+    FROM locked
+    WHERE "order".id = locked.id
+    RETURNING "order".id
+"""
+
+
+def bulk_transition(ids, status):
+    """
+    Переводит заказы в статус одним UPDATE. Заказы, для которых переход из
+    текущего статуса не объявлен в ORDER_STATUS_TRANSITIONS, не меняются.
+    Возвращает (id изменённых заказов, [{'id', 'status'} отклонённых]);
+    status отклонённого заказа - текущий или None, если заказа нет.
+    Оформленные заказы подтверждаются только с товаром на складах: истёкший
+    резерв дорезервируется, а заказ, которому товара не хватило, отклоняется
+    с shortages.
+    """
+    ids = sorted(set(ids))
+    shortages = {}
+    with transaction.atomic():
+        if status != OrderStatus.CANCELLED and OrderStatus.FORMED in status_sources(status):
+            formed = list(Order.objects.select_for_update()
+                          .filter(id__in=ids, status=OrderStatus.FORMED)
+                          .order_by('id')
+                          .values_list('id', flat=True))
+            shortages = reserve_missing_stock(formed)
+            ids = [pk for pk in ids if pk not in shortages]
+
+        with connection.cursor() as cursor:
+            cursor.execute(BULK_TRANSITION_SQL, {'ids': ids, 'sources': status_sources(status), 'status': status})
+            updated = sorted(row[0] for row in cursor.fetchall())
+
+        if updated:
+            if status == OrderStatus.CANCELLED:
+                release_order_reservations(updated)
+                # Источники отмены - неотменённые статусы, эти заказы учтены в сводках
+                apply_orders(updated, sign=-1, skip_cancelled=False)
+            else:
+                confirm_order_reservations(updated)
+
+    updated_set = set(updated)
+    rejected_ids = sorted([pk for pk in ids if pk not in updated_set] + list(shortages))
+    current = dict(Order.objects.filter(id__in=rejected_ids).values_list('id', 'status'))
+    rejected = []
+    for pk in rejected_ids:
+        rejected.append({'id': pk, 'status': current.get(pk)})
+        if pk in shortages:
+            rejected[-1]['shortages'] = shortages[pk]
+    return updated, rejected
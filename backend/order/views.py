@@ -1,37 +1,78 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework.response import Response
-from rest_framework import status, viewsets
+from rest_framework import mixins, status, viewsets
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 
-from order.models import Order, OrderedProduct
-from order.serializers import OrderSerializer, OrderedProductSerializer
+from backend.export import EXPORT_FORMATS, EXPORT_PARAMETERS, export_response
+from backend.pagination import KeysetPagination, PAGINATION_PARAMETERS
+from order.filters import CREATED_FILTER_PARAMETERS, ORDER_FILTER_PARAMETERS, filter_orders
+from order.models import ORDER_STATUS_TRANSITIONS, Order, OrderedProduct, OrderStatus, ReservationStatus
+from order.models import StockReservation
+from order.reservations import InsufficientStock, reserve_stock
+from order.serializers import OrderSerializer, OrderedProductSerializer, StockReservationSerializer
+from order.serializers import ORDER_LINES_PREFETCH, OrderCreateSerializer, OrderWithLinesSerializer
+from order.transitions import bulk_transition
+
+ORDER_HISTORY_ORDERING = ('-created_at', '-id')
+
+INCLUDE_PARAMETER = openapi.Parameter(
+    'include', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=['lines'],
+    description='lines - добавить строки заказа с краткими карточками товаров')
+
+
+def include_lines(params):
+    include = params.get('include')
+    if include and include != 'lines':
+        raise ValidationError({'include': 'Допустимое значение: lines'})
+    return include == 'lines'
+
+
+def order_list_response(request, orders, ordering=ORDER_HISTORY_ORDERING, required=False):
+    """
+    Список заказов с keyset-пагинацией. Со строками (?include=lines) заказы,
+    строки и товары загружаются тремя запросами независимо от размера страницы.
+    """
+    serializer_class = OrderSerializer
+    if include_lines(request.query_params):
+        orders = orders.prefetch_related(ORDER_LINES_PREFETCH)
+        serializer_class = OrderWithLinesSerializer
+
+    paginator = KeysetPagination(ordering=ordering, required=required)
+    page = paginator.paginate_queryset(orders, request)
+    if page is not None:
+        serializer = serializer_class(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    serializer = serializer_class(orders.order_by(*ordering), many=True)
+    return Response(serializer.data)
 
 class OrderAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     @swagger_auto_schema(
-        operation_description="Получение всех заказов",
+        operation_description="Получение заказов. Без created_from - только за последние "
+                              "ORDER_RECENT_MONTHS месяцев",
         manual_parameters=[
-            openapi.Parameter('id', in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
-                              description='id заказа'),
-            openapi.Parameter('user', in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
-                              description='id пользователя'),
-            openapi.Parameter('status', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
-                              description='Статус заказа'),
-            openapi.Parameter('price', in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
-                              description='Общая стоимость заказа'),
+            *ORDER_FILTER_PARAMETERS,
+            INCLUDE_PARAMETER,
+            *PAGINATION_PARAMETERS,
         ]
     )
     def get(self, request):
-        orders = Order.objects.all()
-        serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data)
+        orders = filter_orders(Order.objects.all(), request.query_params, recent=True)
+        return order_list_response(request, orders, ordering=('id',))
 
     @swagger_auto_schema(
-        operation_description="Создание нового заказа",
+        operation_description="Создание нового заказа. Если передан список products, заказ оформляется "
+                              "целиком: строки заказа создаются вместе с ним, цены берутся из товаров, "
+                              "общая стоимость считается на сервере, а товар резервируется на складах",
         request_body=openapi.Schema(
             type=openapi.TYPE_OBJECT,
             properties={
@@ -39,12 +80,38 @@ class OrderAPIView(APIView):
                                        description='id пользователя (обязательное поле)'),
                 'status': openapi.Schema(type=openapi.TYPE_STRING,
                                          description='Статус заказа (по умолчанию "formed")'),
+                'products': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    description='Строки заказа',
+                    items=openapi.Schema(
+                        type=openapi.TYPE_OBJECT,
+                        properties={
+                            'product': openapi.Schema(type=openapi.TYPE_INTEGER,
+                                                      description='id товара'),
+                            'amount': openapi.Schema(type=openapi.TYPE_INTEGER,
+                                                     description='Количество (по умолчанию 1)'),
+                        },
+                    ),
+                ),
                 'price': openapi.Schema(type=openapi.TYPE_INTEGER,
-                                        description='Общая стоимость заказа (обязательное поле)'),
+                                        description='Общая стоимость заказа (обязательное поле, если '
+                                                    'products не передан)'),
             },
         )
     )
     def post(self, request):
+        if 'products' in request.data:
+            serializer = OrderCreateSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            try:
+                order = serializer.save()
+            except InsufficientStock as error:
+                return Response({'error': 'Недостаточно товара на складах', 'shortages': error.shortages},
+                                status=status.HTTP_409_CONFLICT)
+            order = Order.objects.prefetch_related(ORDER_LINES_PREFETCH).get(pk=order.pk)
+            return Response(OrderWithLinesSerializer(order).data,
+                            status=status.HTTP_201_CREATED)
+
         serializer = OrderSerializer(data=request.data)
         if serializer.is_valid():
             serializer.save()
@@ -54,6 +121,32 @@ class OrderAPIView(APIView):
                         status=status.HTTP_400_BAD_REQUEST)
 
 
+class OrderExportAPIView(APIView):
+    """Потоковая выгрузка заказов"""
+
+    permission_classes = [IsAuthenticated]
+
+    # Новые столбцы добавляются в конец, чтобы не сдвигать столбцы у потребителей CSV
+    fields = ('id', 'user', 'status', 'price', 'created_at')
+
+    @swagger_auto_schema(
+        operation_description="Выгрузка заказов в CSV или NDJSON. Фильтры такие же, как у списка заказов, "
+                              "но без created_from выгружаются заказы за всё время",
+        manual_parameters=[
+            *EXPORT_PARAMETERS,
+            *ORDER_FILTER_PARAMETERS,
+        ]
+    )
+    def get(self, request):
+        export_format = request.query_params.get('export_format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return Response({'error': 'export_format должен быть csv или ndjson'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        orders = filter_orders(Order.objects.all(), request.query_params).order_by('id')
+        return export_response(orders, self.fields, export_format, 'orders')
+
+
 class OrderAPIViewDetail(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -99,17 +192,24 @@ class OrderAPIViewDetail(APIView):
         )
     )
     def put(self, request, pk):
-        try:
-            order = Order.objects.get(pk=pk)
-        except Order.DoesNotExist:
-            return Response({'error': 'Заказ не найден'},
-                            status=status.HTTP_404_NOT_FOUND)
+        # Заказ блокируется до подтверждения резерва (order.signals)
+        with transaction.atomic():
+            try:
+                order = Order.objects.select_for_update().get(pk=pk)
+            except Order.DoesNotExist:
+                return Response({'error': 'Заказ не найден'},
+                                status=status.HTTP_404_NOT_FOUND)
 
-        serializer = OrderSerializer(order, data=request.data, partial=True)
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            serializer = OrderSerializer(order, data=request.data, partial=True)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                serializer.save()
+            except InsufficientStock as error:
+                transaction.set_rollback(True)
+                return Response({'error': 'Недостаточно товара на складах', 'shortages': error.shortages},
+                                status=status.HTTP_409_CONFLICT)
+        return Response(serializer.data)
 
     @swagger_auto_schema(
         operation_description="Удаление заказа по id",
@@ -128,32 +228,179 @@ class OrderAPIViewDetail(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+class OrderReservationAPIView(APIView):
+    """Резервирование товара на складах под заказ"""
+
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Резервы заказа по складам",
+        manual_parameters=[
+            openapi.Parameter('id', in_=openapi.IN_PATH, type=openapi.TYPE_INTEGER, description='id заказа'),
+        ]
+    )
+    def get(self, request, pk):
+        reservations = StockReservation.objects.filter(order_id=pk).order_by('id')
+        serializer = StockReservationSerializer(reservations, many=True)
+        return Response(serializer.data)
+
+    @swagger_auto_schema(
+        operation_description="Резервирование товаров заказа. Товар списывается со складов сразу и "
+                              "возвращается при отмене заказа (status=cancelled), его удалении или "
+                              "истечении срока резерва, если заказ не перешёл из статуса formed",
+        manual_parameters=[
+            openapi.Parameter('id', in_=openapi.IN_PATH, type=openapi.TYPE_INTEGER, description='id заказа'),
+        ]
+    )
+    def post(self, request, pk):
+        with transaction.atomic():
+            try:
+                order = Order.objects.select_for_update().get(pk=pk)
+            except Order.DoesNotExist:
+                return Response({'error': 'Заказ не найден'},
+                                status=status.HTTP_404_NOT_FOUND)
+
+            if order.reservations.exclude(status=ReservationStatus.RELEASED).exists():
+                return Response({'error': 'Товары заказа уже зарезервированы'},
+                                status=status.HTTP_409_CONFLICT)
+
+            lines = dict(OrderedProduct.objects
+                         .filter(order=order)
+                         .values('product')
+                         .annotate(total=Sum('amount'))
+                         .values_list('product', 'total'))
+            try:
+                reservations = reserve_stock(order, lines)
+            except InsufficientStock as error:
+                return Response({'error': 'Недостаточно товара на складах', 'shortages': error.shortages},
+                                status=status.HTTP_409_CONFLICT)
+
+        serializer = StockReservationSerializer(reservations, many=True)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class OrderStatusAPIView(APIView):
+    """Статусы заказов и массовая смена статуса"""
+
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Допустимые переходы статусов заказа: {статус: [статусы, в которые можно перейти]}",
+    )
+    def get(self, request):
+        return Response({source: list(targets) for source, targets in ORDER_STATUS_TRANSITIONS.items()})
+
+    @swagger_auto_schema(
+        operation_description="Массовая смена статуса заказов одним запросом. Заказы, для которых переход "
+                              "недопустим или которых нет, не меняются и возвращаются в rejected с текущим "
+                              "статусом. Отмена возвращает резерв на склады и исключает заказы из аналитики. "
+                              "Оформленный заказ, резерв которого истёк, подтверждается только если товар "
+                              "удалось зарезервировать заново, иначе он попадает в rejected с shortages",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'ids': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_INTEGER),
+                                      description='id заказов'),
+                'status': openapi.Schema(type=openapi.TYPE_STRING, enum=list(OrderStatus.values),
+                                         description='Новый статус'),
+            },
+        )
+    )
+    def post(self, request):
+        ids = request.data.get('ids')
+        new_status = request.data.get('status')
+        if new_status not in OrderStatus.values:
+            return Response({'error': 'Допустимые статусы: ' + ', '.join(OrderStatus.values)},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+            return Response({'error': 'ids должен быть списком целых чисел'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > settings.ORDER_STATUS_BULK_MAX_IDS:
+            return Response({'error': f'Не более {settings.ORDER_STATUS_BULK_MAX_IDS} заказов за запрос'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        updated, rejected = bulk_transition(ids, new_status)
+        return Response({'status': new_status, 'updated': updated, 'rejected': rejected})
+
+
 class OrdersUserAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     @swagger_auto_schema(
-        operation_description="Получение всех заказов пользователя",
+        operation_description="Получение заказов пользователя. Без created_from - только за последние "
+                              "ORDER_RECENT_MONTHS месяцев",
         manual_parameters=[
             openapi.Parameter('user', in_=openapi.IN_PATH, type=openapi.TYPE_INTEGER,
                               description='id пользователя'),
+            *CREATED_FILTER_PARAMETERS,
+            INCLUDE_PARAMETER,
+            *PAGINATION_PARAMETERS,
         ]
     )
     def get(self, request, fk):
-        try:
-            orders = Order.objects.filter(user=fk)
-        except Order.DoesNotExist:
-            return Response({'error': 'Заказы пользователя не найдены'},
-                            status=status.HTTP_404_NOT_FOUND)
+        orders = filter_orders(Order.objects.filter(user=fk), request.query_params, recent=True)
+        return order_list_response(request, orders)
 
-        serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data)
 
+class OrderViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, mixins.UpdateModelMixin,
+                   viewsets.GenericViewSet):
+    """
+    Заказы (/orders/): постраничный список новых заказов первыми с фильтрами
+    по пользователю, статусу и дате создания, ?include=lines - со строками.
+    Списки без created_from ограничены последними ORDER_RECENT_MONTHS месяцами.
+    Создание заказа - только через /order/, где цена считается по строкам
+    """
 
-class OrderViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
 
+    def get_serializer_class(self):
+        if self.action == 'retrieve' and include_lines(self.request.query_params):
+            return OrderWithLinesSerializer
+        return OrderSerializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'retrieve' and include_lines(self.request.query_params):
+            queryset = queryset.prefetch_related(ORDER_LINES_PREFETCH)
+        if self.action in ('update', 'partial_update'):
+            queryset = queryset.select_for_update()
+        return queryset
+
+    def update(self, request, *args, **kwargs):
+        with transaction.atomic():
+            try:
+                return super().update(request, *args, **kwargs)
+            except InsufficientStock as error:
+                transaction.set_rollback(True)
+                return Response({'error': 'Недостаточно товара на складах', 'shortages': error.shortages},
+                                status=status.HTTP_409_CONFLICT)
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            *ORDER_FILTER_PARAMETERS,
+            INCLUDE_PARAMETER,
+            *PAGINATION_PARAMETERS,
+        ]
+    )
+    def list(self, request, *args, **kwargs):
+        orders = filter_orders(self.get_queryset(), request.query_params, recent=True)
+        return order_list_response(request, orders, required=True)
+
+    @swagger_auto_schema(manual_parameters=[INCLUDE_PARAMETER])
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('user_id', in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description='id пользователя (обязательный параметр)'),
+            *CREATED_FILTER_PARAMETERS,
+            INCLUDE_PARAMETER,
+            *PAGINATION_PARAMETERS,
+        ]
+    )
     @action(detail=False, methods=['get'])
     def order_by_user(self, request):
         # Получаем идентификатор пользователя из запроса
@@ -162,9 +409,12 @@ class OrderViewSet(viewsets.ModelViewSet):
             return Response(data={'error': 'User ID обязателен в параметрах запроса'},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        orders = Order.object.filter(user_id=user_id)
-        serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data)
+        try:
+            orders = filter_orders(Order.objects.filter(user_id=int(user_id)), request.query_params, recent=True)
+        except ValueError:
+            return Response(data={'error': 'Некорректный User ID'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return order_list_response(request, orders, required=True)
 
     @action(detail=False, methods=['get'])
     def product_in_order(self, request):
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class ShowcaseConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'showcase'
+
+    def ready(self):
+        from showcase import signals  # noqa: F401
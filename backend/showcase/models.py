@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from catalog.models import Product
 
 
@@ -9,6 +10,9 @@ class Banner(models.Model):
     products = models.ManyToManyField(Product, related_name='banners', blank=True)
     is_show = models.BooleanField('is_show', default=False, blank=False)
     image = models.ImageField(upload_to='banner_image/', default=None)
+    image_variants = models.JSONField('image_variants', default=dict, editable=False)
+    created_at = models.DateTimeField('created_at', default=timezone.now, editable=False)
+    updated_at = models.DateTimeField('updated_at', auto_now=True, db_index=True)
 
     class Meta:
         db_table = 'banner'
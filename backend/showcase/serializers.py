@@ -1,7 +1,43 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
+
+from backend.images import ImageVariantsField
+from catalog.models import Product
+from catalog.serializers import PRODUCT_SUMMARY_FIELDS, ProductSummarySerializer
 from .models import Banner
 
+EXPANDABLE_FIELDS = ('products',)
+
+
 class BannerSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Banner
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+
+class BannerExpandedSerializer(BannerSerializer):
+    """Баннер с вложенными краткими карточками товаров вместо id"""
+
+    products = ProductSummarySerializer(many=True, read_only=True)
+
+
+def get_expand(params):
+    expand = {value for value in params.get('expand', '').split(',') if value}
+    unknown = expand.difference(EXPANDABLE_FIELDS)
+    if unknown:
+        raise serializers.ValidationError({'expand': 'Допустимые значения: ' + ', '.join(EXPANDABLE_FIELDS)})
+    return expand
+
+
+def banner_queryset(expand=False):
+    """
+    Баннеры с товарами, загруженными одним дополнительным запросом.
+    Для вложенных карточек выбираются только поля краткой карточки,
+    иначе достаточно id связанных товаров.
+    """
+    fields = PRODUCT_SUMMARY_FIELDS if expand else ('id',)
+    return Banner.objects.prefetch_related(
+        Prefetch('products', queryset=Product.objects.only(*fields).order_by('sorder_order', 'id'))
+    )
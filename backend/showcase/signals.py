@@ -0,0 +1,42 @@
+from django.db.models.functions import Now
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from backend.cache import invalidate_tags
+from backend.images import schedule_variants
+from catalog.models import Product
+from showcase.models import Banner
+
+
+@receiver(m2m_changed, sender=Banner.products.through)
+def banner_products_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        # После очистки со стороны товара связанные баннеры уже не найти
+        Banner.objects.filter(products=instance).update(updated_at=Now())
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if not reverse:
+            Banner.objects.filter(pk=instance.pk).update(updated_at=Now())
+        elif pk_set:
+            Banner.objects.filter(pk__in=pk_set).update(updated_at=Now())
+    else:
+        return
+    invalidate_tags('banner')
+
+
+@receiver(pre_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    # Связи баннера с товаром удаляются каскадом без m2m_changed
+    Banner.objects.filter(products=instance).update(updated_at=Now())
+    invalidate_tags('banner')
+
+
+@receiver([post_save, post_delete], sender=Banner)
+def banner_invalidate_cache(sender, **kwargs):
+    invalidate_tags('banner')
+
+
+@receiver(post_save, sender=Banner)
+def banner_image_variants(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'image' not in update_fields:
+        return
+    schedule_variants(instance, 'banner')
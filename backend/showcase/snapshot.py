@@ -0,0 +1,47 @@
+import hashlib
+import threading
+from collections import namedtuple
+
+from django.core.cache import cache
+from rest_framework.renderers import JSONRenderer
+
+from backend.cache import get_tag_versions
+from showcase.serializers import BannerExpandedSerializer, banner_queryset
+
+SNAPSHOT_KEY = 'showcase:snapshot'
+SNAPSHOT_TAGS = ('banner', 'product')
+
+Snapshot = namedtuple('Snapshot', ('versions', 'body', 'etag'))
+
+_local = threading.local()
+
+
+def build_snapshot(versions):
+    """Собирает JSON активных баннеров с краткими карточками товаров (два запроса)."""
+    banners = banner_queryset(expand=True).filter(is_show=True).order_by('id')
+    body = JSONRenderer().render(BannerExpandedSerializer(banners, many=True).data)
+    return Snapshot(versions, body, '"{0}"'.format(hashlib.md5(body).hexdigest()))
+
+
+def get_snapshot():
+    """
+    Возвращает готовый снимок витрины без обращения к БД.
+
+    Снимок привязан к версиям тегов banner и product, которые меняются
+    сигналами при изменении баннеров, их товаров и связей между ними.
+    Пока версии совпадают, тело отдаётся из памяти процесса, иначе из
+    общего кэша; пересборка происходит только после изменений.
+    """
+    versions = get_tag_versions(SNAPSHOT_TAGS)
+
+    snapshot = getattr(_local, 'snapshot', None)
+    if snapshot is not None and snapshot.versions == versions:
+        return snapshot
+
+    snapshot = cache.get(SNAPSHOT_KEY)
+    if snapshot is None or snapshot.versions != versions:
+        snapshot = build_snapshot(versions)
+        cache.set(SNAPSHOT_KEY, snapshot, timeout=None)
+
+    _local.snapshot = snapshot
+    return snapshot
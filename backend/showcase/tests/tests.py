@@ -20,8 +20,8 @@ class BannerTest(TestCase):
             'password':'pass'
         }
         response = self.client.post('/login/', json.dumps(json_login_body), content_type="application/json")
-        cookies = response.cookies.get('jwt').value
-        self.client.defaults['HTTP_AUTHORIZATION'] = 'Bearer ' + cookies
+        self.cookies = response.cookies.get('jwt').value
+        self.client.defaults['HTTP_AUTHORIZATION'] = 'Bearer ' + self.cookies
 
     def test_banner(self):
         #post
@@ -56,6 +56,32 @@ class BannerTest(TestCase):
         self.assertEqual(response.status_code,200)
         print('banner get done')
 
+        #get expanded
+        response = self.client.get('/banner/?expand=products')
+        self.assertEqual(response.status_code,200)
+        self.assertEqual(response.data[0]['products'][0]['id'], product_id)
+        self.assertEqual(response.data[0]['products'][0]['name'], 'helmet')
+        response = self.client.get('/banner/?expand=category')
+        self.assertEqual(response.status_code,400)
+        print('banner expanded get done')
+
+        #showcase
+        self.client.defaults.pop('HTTP_AUTHORIZATION')
+        response = self.client.get('/showcase/')
+        self.assertEqual(response.status_code,200)
+        self.assertEqual(json.loads(response.content), [])
+        self.client.defaults['HTTP_AUTHORIZATION'] = 'Bearer ' + self.cookies
+        response = self.client.put('/banner/{0}/'.format(banner_id), {'is_show':True},
+                                   content_type="application/json")
+        self.client.defaults.pop('HTTP_AUTHORIZATION')
+        response = self.client.get('/showcase/')
+        self.assertEqual(json.loads(response.content)[0]['products'][0]['id'], product_id)
+        etag = response['ETag']
+        response = self.client.get('/showcase/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code,304)
+        self.client.defaults['HTTP_AUTHORIZATION'] = 'Bearer ' + self.cookies
+        print('showcase get done')
+
         #get detail
         response = self.client.get('/banner/{0}/'.format(banner_id))
         self.assertEqual(response.status_code,200)
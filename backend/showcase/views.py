@@ -1,12 +1,22 @@
+from django.http import HttpResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.views import APIView
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
 
+from backend.cache import cache_response
+from backend.conditional import detail_etag, list_etag
 from showcase.models import Banner, Product
-from showcase.serializers import BannerSerializer
+from showcase.serializers import BannerExpandedSerializer, BannerSerializer, banner_queryset, get_expand
+from showcase.snapshot import get_snapshot
+
+EXPAND_PARAMETER = openapi.Parameter(
+    'expand', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=['products'],
+    description='products - вернуть краткие карточки товаров вместо списка id')
 
 
 class BannerAPIView(APIView):
@@ -29,12 +39,16 @@ class BannerAPIView(APIView):
                               description='Булево значение для баннера, показывать его или нет'),
             openapi.Parameter('image', in_=openapi.IN_QUERY, type=openapi.TYPE_FILE,
                               description='Изображение баннера'),
-
+            EXPAND_PARAMETER,
         ]
     )
+    @list_etag(Banner, Product)
+    @cache_response('banner', 'product')
     def get(self, request):
-        banners = Banner.objects.all()
-        serializer = BannerSerializer(banners, many=True)
+        expand = get_expand(request.query_params)
+        banners = banner_queryset(expand='products' in expand)
+        serializer_class = BannerExpandedSerializer if expand else BannerSerializer
+        serializer = serializer_class(banners, many=True)
         return Response(serializer.data)
 
     @swagger_auto_schema(
@@ -92,9 +106,11 @@ class BannerAPIViewDetail(APIView):
                               description='Изображение баннера'),
         ]
     )
+    @detail_etag(Banner)
+    @cache_response('banner')
     def get(self, request, pk):
         try:
-            banner = Banner.objects.get(pk=pk)
+            banner = banner_queryset().get(pk=pk)
             serializer = BannerSerializer(banner)
             return Response(serializer.data)
         except Banner.DoesNotExist:
@@ -161,3 +177,20 @@ class BannerAPIViewDetail(APIView):
 
         banner.delete()
         return Response("success", status=status.HTTP_204_NO_CONTENT)
+
+
+class ShowcaseAPIView(APIView):
+    """Публичная витрина: активные баннеры с карточками товаров"""
+
+    permission_classes = [AllowAny]
+    # JWT-аутентификация читала бы пользователя из БД на каждом запросе
+    authentication_classes = []
+
+    @swagger_auto_schema(
+        operation_description="Снимок витрины: баннеры с is_show=True и краткие карточки их товаров. "
+                              "Собирается заранее и отдаётся из кэша без запросов к БД",
+    )
+    @method_decorator(condition(etag_func=lambda request: get_snapshot().etag))
+    def get(self, request):
+        snapshot = get_snapshot()
+        return HttpResponse(snapshot.body, content_type='application/json')
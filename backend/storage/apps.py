@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+class StorageConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'storage'
+
+    def ready(self):
+        from storage import signals  # noqa: F401
+        from storage.stock import install_stock_trigger
+
+        post_migrate.connect(install_stock_trigger, sender=self)
@@ -0,0 +1,105 @@
+import math
+import re
+
+from django.conf import settings
+from django.db.models import ExpressionWrapper, F, FloatField, Value
+from django.db.models.functions import ASin, Cos, Least, Power, Radians, Sin, Sqrt
+
+from storage.models import ProductStorage
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+# Половина окружности Земли: круг такого радиуса покрывает её целиком
+MAX_RADIUS_KM = math.pi * EARTH_RADIUS_KM
+
+NUMBER_RE = re.compile(r'-?\d+(?:[.,]\d+)?')
+# Буква полушария - отдельный токен: "55.75S", "ю.ш.", но не "Sklad" или "West gate"
+SOUTH_RE = re.compile(r'(?<![A-ZА-ЯЁ])(S|Ю\.?\s*Ш)(?![A-ZА-ЯЁ])', re.IGNORECASE)
+WEST_RE = re.compile(r'(?<![A-ZА-ЯЁ])(W|З\.?\s*Д)(?![A-ZА-ЯЁ])', re.IGNORECASE)
+
+
+def parse_coordinates(text):
+    """
+    Разбирает координаты склада из строки в свободной форме: "55.75, 37.61",
+    "55,75; 37,61", "55.75N 37.61E", "55.75 с.ш. 37.61 в.д." и т.п.
+    Первое число - широта. Возвращает (latitude, longitude) или None.
+    """
+    if not text:
+        return None
+
+    numbers = NUMBER_RE.findall(text)
+    if len(numbers) == 1 and ',' in numbers[0]:
+        # "55,37" - пара целых через запятую
+        numbers = numbers[0].split(',')
+    if len(numbers) != 2:
+        return None
+
+    latitude, longitude = (float(number.replace(',', '.')) for number in numbers)
+    if SOUTH_RE.search(text):
+        latitude = -abs(latitude)
+    if WEST_RE.search(text):
+        longitude = -abs(longitude)
+
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    return latitude, longitude
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """
+    Прямоугольник вокруг точки, содержащий круг радиуса radius_km:
+    (min_latitude, max_latitude, (min_longitude, max_longitude) или None).
+    Если круг задевает полюс или линию смены дат, долгота не ограничивается.
+    """
+    delta_latitude = radius_km / KM_PER_DEGREE
+    min_latitude, max_latitude = latitude - delta_latitude, latitude + delta_latitude
+    if min_latitude <= -90 or max_latitude >= 90:
+        return max(min_latitude, -90), min(max_latitude, 90), None
+
+    widest = math.cos(math.radians(max(abs(min_latitude), abs(max_latitude))))
+    delta_longitude = radius_km / (KM_PER_DEGREE * widest)
+    min_longitude, max_longitude = longitude - delta_longitude, longitude + delta_longitude
+    if min_longitude < -180 or max_longitude > 180:
+        return min_latitude, max_latitude, None
+    return min_latitude, max_latitude, (min_longitude, max_longitude)
+
+
+def haversine(latitude, longitude, prefix=''):
+    """Расстояние в километрах от точки до координат строки (формула гаверсинусов)."""
+    row_latitude, row_longitude = F(f'{prefix}latitude'), F(f'{prefix}longitude')
+    a = (Power(Sin(Radians(row_latitude - Value(latitude)) / 2), 2)
+         + Value(math.cos(math.radians(latitude))) * Cos(Radians(row_latitude))
+         * Power(Sin(Radians(row_longitude - Value(longitude)) / 2), 2))
+    # Ошибки округления не должны выводить аргумент arcsin за 1
+    return ExpressionWrapper(2 * EARTH_RADIUS_KM * ASin(Least(Sqrt(a), Value(1.0))), output_field=FloatField())
+
+
+def nearest_storages(latitude, longitude, product, count=1, limit=5):
+    """
+    Ближайшие к точке склады, на которых есть не меньше count единиц товара.
+
+    Кандидаты отбираются по прямоугольнику вокруг точки (индекс по широте и
+    долготе), затем сортируются по расстоянию гаверсинуса. Если в круге
+    меньше limit складов, радиус увеличивается в STORAGE_NEAREST_RADIUS_STEP
+    раз, пока не покроет всю Землю. Результат - записи ProductStorage с
+    загруженным складом и атрибутом distance в километрах.
+    """
+    stock = ProductStorage.objects.filter(product_id=product, count_product__gte=count,
+                                          storage__latitude__isnull=False)
+    radius = settings.STORAGE_NEAREST_RADIUS_KM
+    while True:
+        min_latitude, max_latitude, longitude_range = bounding_box(latitude, longitude, radius)
+        candidates = stock.filter(storage__latitude__range=(min_latitude, max_latitude))
+        if longitude_range is not None:
+            candidates = candidates.filter(storage__longitude__range=longitude_range)
+
+        # Склад внутри прямоугольника, но вне круга может оказаться дальше
+        # склада за пределами прямоугольника, поэтому отсекается по радиусу
+        candidates = candidates.annotate(distance=haversine(latitude, longitude, prefix='storage__'))
+        if radius < MAX_RADIUS_KM:
+            candidates = candidates.filter(distance__lte=radius)
+
+        rows = list(candidates.select_related('storage').order_by('distance', 'storage_id')[:limit])
+        if len(rows) == limit or radius >= MAX_RADIUS_KM:
+            return rows
+        radius = min(radius * settings.STORAGE_NEAREST_RADIUS_STEP, MAX_RADIUS_KM)
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db.models.functions import Now
+
+from backend.cache import invalidate_tags
+from storage.geo import parse_coordinates
+from storage.models import Storage
+
+
+class Command(BaseCommand):
+    help = 'Заполняет широту и долготу складов из строкового поля coordinates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Пересчитать и склады, у которых координаты уже заполнены')
+
+    def handle(self, *args, **options):
+        storages = Storage.objects.exclude(coordinates='')
+        if not options['all']:
+            storages = storages.filter(latitude__isnull=True)
+
+        parsed, failed = [], []
+        for pk, coordinates in storages.values_list('id', 'coordinates').iterator():
+            coordinates_pair = parse_coordinates(coordinates)
+            if coordinates_pair is None:
+                failed.append((pk, coordinates))
+            else:
+                parsed.append(Storage(id=pk, latitude=coordinates_pair[0], longitude=coordinates_pair[1]))
+
+        Storage.objects.bulk_update(parsed, ['latitude', 'longitude'], batch_size=1000)
+        if parsed:
+            Storage.objects.filter(id__in=[storage.id for storage in parsed]).update(updated_at=Now())
+            invalidate_tags('storage')
+
+        for pk, coordinates in failed:
+            self.stderr.write(f'Склад {pk}: не удалось разобрать координаты "{coordinates}"')
+        self.stdout.write(self.style.SUCCESS(f'Заполнено складов: {len(parsed)}, не разобрано: {len(failed)}'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from storage.stock import reconcile_stock
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает остатки товаров (product.count) по записям на складах'
+
+    def handle(self, *args, **options):
+        updated = reconcile_stock()
+        self.stdout.write(self.style.SUCCESS(f'Исправлено товаров: {updated}'))
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 from catalog.models import Product
 
@@ -8,9 +9,16 @@ class Storage(models.Model):
     name = models.CharField(max_length=100, blank=False)
     location = models.CharField(max_length=255, blank=False)
     coordinates = models.CharField(max_length=100, default='')
+    latitude = models.FloatField('latitude', null=True, blank=True)
+    longitude = models.FloatField('longitude', null=True, blank=True)
+    created_at = models.DateTimeField('created_at', default=timezone.now, editable=False)
+    updated_at = models.DateTimeField('updated_at', auto_now=True, db_index=True)
 
     class Meta:
         db_table = 'storage'
+        indexes = [
+            models.Index(fields=['latitude', 'longitude'], name='storage_coordinates_idx'),
+        ]
 
 
 class ProductStorage(models.Model):
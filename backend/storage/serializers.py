@@ -1,3 +1,4 @@
+from storage.geo import parse_coordinates
 from storage.models import Storage, ProductStorage
 from rest_framework import serializers
 
@@ -8,9 +9,32 @@ class StorageSerializer(serializers.ModelSerializer):
 
         fields = '__all__'
 
+    def validate(self, attrs):
+        # Новая строка координат пересчитывает широту и долготу, если их не передали явно
+        if 'coordinates' in attrs and 'latitude' not in attrs and 'longitude' not in attrs:
+            parsed = parse_coordinates(attrs['coordinates'])
+            attrs['latitude'], attrs['longitude'] = parsed if parsed is not None else (None, None)
+        return attrs
+
+    def validate_latitude(self, value):
+        if value is not None and not -90 <= value <= 90:
+            raise serializers.ValidationError('Широта должна быть от -90 до 90')
+        return value
+
+    def validate_longitude(self, value):
+        if value is not None and not -180 <= value <= 180:
+            raise serializers.ValidationError('Долгота должна быть от -180 до 180')
+        return value
+
 
 class ProductStorageSerializer(serializers.ModelSerializer):
     class Meta:
         model = ProductStorage
 
         fields = '__all__'
+
+
+class StockRowSerializer(serializers.Serializer):
+    storage = serializers.IntegerField()
+    product = serializers.IntegerField()
+    count_product = serializers.IntegerField()
@@ -0,0 +1,29 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from backend.cache import invalidate_tags
+from storage.geo import parse_coordinates
+from storage.models import ProductStorage, Storage
+
+
+@receiver(pre_save, sender=Storage)
+def storage_parse_coordinates(sender, instance, **kwargs):
+    if instance.latitude is None and instance.longitude is None:
+        parsed = parse_coordinates(instance.coordinates)
+        if parsed is not None:
+            instance.latitude, instance.longitude = parsed
+
+
+@receiver([post_save, post_delete], sender=Storage)
+def storage_invalidate_cache(sender, signal, **kwargs):
+    if signal is post_delete:
+        # Записи о товарах на складе удаляются каскадом, а триггер меняет остатки товаров
+        invalidate_tags('storage', 'product_storage', 'product')
+    else:
+        invalidate_tags('storage')
+
+
+@receiver([post_save, post_delete], sender=ProductStorage)
+def product_storage_invalidate_cache(sender, **kwargs):
+    # product.count пересчитывает триггер на product_storage
+    invalidate_tags('product_storage', 'product')
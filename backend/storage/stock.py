@@ -0,0 +1,182 @@
+from django.db import connection, connections, transaction
+
+from backend.cache import invalidate_tags
+from catalog.models import Product
+from storage.models import ProductStorage, Storage
+from storage.serializers import StockRowSerializer
+
+# product.count = сумма product_storage.count_product по всем складам.
+# Триггер меняет остаток товара на разницу в той же транзакции, что и
+# запись на складе, поэтому сумма не расходится и без пересчёта.
+STOCK_TRIGGER_SQL = """
+    CREATE OR REPLACE FUNCTION product_storage_sync_count() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND OLD.product_id = NEW.product_id THEN
+            IF OLD.count_product <> NEW.count_product THEN
+                UPDATE product SET count = count + NEW.count_product - OLD.count_product, updated_at = now()
+                WHERE id = NEW.product_id;
+            END IF;
+            RETURN NULL;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE product SET count = count - OLD.count_product, updated_at = now()
+            WHERE id = OLD.product_id;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'INSERT') THEN
+            UPDATE product SET count = count + NEW.count_product, updated_at = now()
+            WHERE id = NEW.product_id;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER IF EXISTS product_storage_sync_count ON product_storage;
+    CREATE TRIGGER product_storage_sync_count
+        AFTER INSERT OR DELETE OR UPDATE OF product_id, count_product ON product_storage
+        FOR EACH ROW EXECUTE FUNCTION product_storage_sync_count();
+"""
+
+RECONCILE_STOCK_SQL = """
+    UPDATE product
+    SET count = totals.total, updated_at = now()
+    FROM (
+        SELECT product.id, COALESCE(SUM(product_storage.count_product), 0) AS total
+        FROM product
+        LEFT JOIN product_storage ON product_storage.product_id = product.id
+        GROUP BY product.id
+    ) AS totals
+    WHERE product.id = totals.id AND product.count <> totals.total
+"""
+
+BULK_STOCK_SQL = """
+    INSERT INTO product_storage (storage_id, product_id, count_product)
+    SELECT * FROM unnest(%s::bigint[], %s::bigint[], %s::integer[])
+    ON CONFLICT (storage_id, product_id) DO UPDATE
+    SET count_product = {value}
+    WHERE product_storage.count_product <> {value} AND {value} >= 0
+    RETURNING storage_id, product_id, count_product
+"""
+
+BULK_STOCK_VALUES = {
+    'set': 'EXCLUDED.count_product',
+    'increment': 'product_storage.count_product + EXCLUDED.count_product',
+}
+
+
+class NegativeStock(Exception):
+    """Запись увела бы остаток ниже нуля; errors - список {storage, product, errors}"""
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def install_stock_trigger(sender, using, **kwargs):
+    """Создаёт триггер синхронизации остатков (post_migrate приложения storage)."""
+    with connections[using].cursor() as cursor:
+        cursor.execute(STOCK_TRIGGER_SQL)
+
+
+def reconcile_stock():
+    """
+    Пересчитывает product.count по складам одним GROUP BY и исправляет
+    только разошедшиеся строки. Возвращает количество исправленных товаров.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(RECONCILE_STOCK_SQL)
+        updated = cursor.rowcount
+    if updated:
+        invalidate_tags('product')
+    return updated
+
+
+def get_stock(product):
+    """Остаток товара по складам."""
+    rows = (ProductStorage.objects
+            .filter(product=product)
+            .order_by('storage_id')
+            .values_list('storage_id', 'storage__name', 'count_product'))
+    return {
+        'product': product.id,
+        'count': product.count,
+        'storages': [
+            {'storage': storage_id, 'name': name, 'count_product': count}
+            for storage_id, name, count in rows
+        ],
+    }
+
+
+def validate_stock_rows(rows, mode):
+    """
+    Проверяет пачку строк (storage, product, count_product). Существование
+    складов и товаров проверяется двумя запросами на всю пачку.
+    Возвращает остатки по парам (склад, товар) и список ошибок с номерами строк;
+    повторы пары в set побеждает последняя строка, в increment они суммируются.
+    """
+    serializer = StockRowSerializer(data=rows, many=True)
+    if not serializer.is_valid():
+        errors = [{'row': number, 'errors': row_errors}
+                  for number, row_errors in enumerate(serializer.errors, start=1) if row_errors]
+        return {}, errors
+
+    rows = serializer.validated_data
+    storages = set(Storage.objects.filter(id__in={row['storage'] for row in rows}).values_list('id', flat=True))
+    products = set(Product.objects.filter(id__in={row['product'] for row in rows}).values_list('id', flat=True))
+
+    totals = {}
+    errors = []
+    for number, row in enumerate(rows, start=1):
+        row_errors = {}
+        if row['storage'] not in storages:
+            row_errors['storage'] = ['Склад не найден']
+        if row['product'] not in products:
+            row_errors['product'] = ['Товар не найден']
+        if mode == 'set' and row['count_product'] < 0:
+            row_errors['count_product'] = ['Остаток не может быть отрицательным']
+        if row_errors:
+            errors.append({'row': number, 'errors': row_errors})
+            continue
+
+        key = (row['storage'], row['product'])
+        if mode == 'increment':
+            totals[key] = totals.get(key, 0) + row['count_product']
+        else:
+            totals[key] = row['count_product']
+    return totals, errors
+
+
+def bulk_upsert_stock(totals, mode):
+    """
+    Записывает остатки одним INSERT ... ON CONFLICT. Строки, значение которых
+    не меняется, не обновляются, поэтому триггер остатков их не трогает.
+    Остаток, который стал бы отрицательным, не обновляется (проверка идёт под
+    блокировкой строки), а новая запись с отрицательным остатком видна в
+    RETURNING; в обоих случаях пачка откатывается целиком с NegativeStock.
+    Возвращает количество вставленных и изменённых записей.
+    """
+    # Строки идут в порядке товаров: триггер блокирует товары в том же порядке,
+    # что и резервирование заказов (order.reservations.lock_products)
+    keys = sorted(totals, key=lambda key: (key[1], key[0]))
+    if not keys:
+        return 0
+    sql = BULK_STOCK_SQL.format(value=BULK_STOCK_VALUES[mode])
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(sql, [
+            [storage for storage, _ in keys],
+            [product for _, product in keys],
+            [totals[key] for key in keys],
+        ])
+        written = {(storage, product): count for storage, product, count in cursor.fetchall()}
+
+        # Кроме строк без изменений не записываются только те, остаток
+        # которых ушёл бы ниже нуля (в set отрицательные значения уже отклонены)
+        rejected = [key for key in keys
+                    if written.get(key, 0) < 0 or (mode == 'increment' and key not in written and totals[key])]
+        if rejected:
+            raise NegativeStock([
+                {'storage': storage, 'product': product,
+                 'errors': {'count_product': ['Остаток не может стать отрицательным']}}
+                for storage, product in rejected
+            ])
+        invalidate_tags('product_storage', 'product')
+    return len(written)
@@ -0,0 +1,127 @@
+from django.test import TestCase
+import json
+from user.serializers import UserSerializer
+
+from catalog.models import Product
+from storage.geo import parse_coordinates
+from storage.models import ProductStorage, Storage
+from storage.stock import reconcile_stock
+
+
+class StorageTest(TestCase):
+    def setUp(self):
+        json_user_body = {
+            'email':'user@mail.ru',
+            'name':'username',
+            'password':'pass'
+        }
+        serializer =UserSerializer(data=json_user_body)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        json_login_body = {
+            'email':'user@mail.ru',
+            'password':'pass'
+        }
+        response = self.client.post('/login/', json.dumps(json_login_body), content_type="application/json")
+        cookies = response.cookies.get('jwt').value
+        self.client.defaults['HTTP_AUTHORIZATION'] = 'Bearer ' + cookies
+
+    def test_product_stock(self):
+        product = Product.objects.create(name='helmet', brand='gucci')
+        first = Storage.objects.create(name='north', location='Moscow')
+        second = Storage.objects.create(name='south', location='Sochi')
+
+        first_stock = ProductStorage.objects.create(storage=first, product=product, count_product=5)
+        ProductStorage.objects.create(storage=second, product=product, count_product=3)
+        product.refresh_from_db()
+        self.assertEqual(product.count, 8)
+
+        first_stock.count_product = 1
+        first_stock.save()
+        product.refresh_from_db()
+        self.assertEqual(product.count, 4)
+
+        response = self.client.get('/product/{0}/stock/'.format(product.id))
+        self.assertEqual(response.status_code,200)
+        self.assertEqual(response.data['count'], 4)
+        self.assertEqual([row['count_product'] for row in response.data['storages']], [1, 3])
+
+        second.delete()
+        product.refresh_from_db()
+        self.assertEqual(product.count, 1)
+
+        Product.objects.filter(pk=product.pk).update(count=100)
+        self.assertEqual(reconcile_stock(), 1)
+        product.refresh_from_db()
+        self.assertEqual(product.count, 1)
+        print('product stock done')
+
+    def test_product_stock_bulk(self):
+        product = Product.objects.create(name='helmet', brand='gucci')
+        storage = Storage.objects.create(name='north', location='Moscow')
+        rows = [
+            {'storage': storage.id, 'product': product.id, 'count_product': 2},
+            {'storage': storage.id, 'product': product.id, 'count_product': 3},
+        ]
+
+        response = self.client.post('/productStorage/bulk/?mode=increment', json.dumps(rows),
+                                    content_type="application/json")
+        self.assertEqual(response.status_code,200)
+        self.assertEqual(ProductStorage.objects.get(storage=storage, product=product).count_product, 5)
+
+        response = self.client.post('/productStorage/bulk/', json.dumps(rows[:1]),
+                                    content_type="application/json")
+        self.assertEqual(response.status_code,200)
+        product.refresh_from_db()
+        self.assertEqual(product.count, 2)
+
+        rows.append({'storage': storage.id + 1, 'product': product.id, 'count_product': 1})
+        response = self.client.post('/productStorage/bulk/', json.dumps(rows),
+                                    content_type="application/json")
+        self.assertEqual(response.status_code,400)
+        self.assertEqual(response.data['errors'][0]['row'], 3)
+
+        #increment never drives stock below zero
+        south = Storage.objects.create(name='south', location='Sochi')
+        for storage_id, delta in ((storage.id, -3), (south.id, -1)):
+            rows = [{'storage': storage_id, 'product': product.id, 'count_product': delta}]
+            response = self.client.post('/productStorage/bulk/?mode=increment', json.dumps(rows),
+                                        content_type="application/json")
+            self.assertEqual(response.status_code,409)
+            self.assertEqual(response.data['errors'][0]['storage'], storage_id)
+        self.assertFalse(ProductStorage.objects.filter(storage=south).exists())
+        product.refresh_from_db()
+        self.assertEqual(product.count, 2)
+        print('product stock bulk done')
+
+
+
+    def test_product_nearest_storages(self):
+        product = Product.objects.create(name='helmet', brand='gucci')
+        moscow = Storage.objects.create(name='moscow', location='Moscow', coordinates='55.75, 37.61')
+        tver = Storage.objects.create(name='tver', location='Tver', coordinates='56,86; 35,90')
+        sochi = Storage.objects.create(name='sochi', location='Sochi', coordinates='43.60N 39.73E')
+        ProductStorage.objects.create(storage=moscow, product=product, count_product=1)
+        ProductStorage.objects.create(storage=tver, product=product, count_product=5)
+        ProductStorage.objects.create(storage=sochi, product=product, count_product=5)
+        tver.refresh_from_db()
+        self.assertEqual((tver.latitude, tver.longitude), (56.86, 35.9))
+
+        params = {'lat': 55.76, 'lon': 37.62, 'product': product.id, 'count': 2, 'limit': 2}
+        response = self.client.get('/storage/nearest/', params)
+        self.assertEqual(response.status_code,200)
+        self.assertEqual([row['name'] for row in response.data], ['tver', 'sochi'])
+        self.assertLess(response.data[0]['distance'], response.data[1]['distance'])
+
+        response = self.client.get('/storage/nearest/', {'lat': 55.76})
+        self.assertEqual(response.status_code,400)
+        print('product nearest storages done')
+
+    def test_storage_parse_coordinates(self):
+        self.assertEqual(parse_coordinates('55.75S 37.61W'), (-55.75, -37.61))
+        self.assertEqual(parse_coordinates('55.75 ю.ш. 37.61 з.д.'), (-55.75, -37.61))
+        #words starting with S/W are not hemisphere letters
+        self.assertEqual(parse_coordinates('Sklad 55.75 37.61'), (55.75, 37.61))
+        self.assertEqual(parse_coordinates('West gate 55.75, 37.61'), (55.75, 37.61))
+        self.assertEqual(parse_coordinates('south entrance 55.75 37.61'), (55.75, 37.61))
+        print('storage parse coordinates done')
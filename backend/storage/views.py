@@ -1,3 +1,4 @@
+from django.conf import settings
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
@@ -5,6 +6,10 @@ from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import status
 
+from backend.cache import cache_response
+from backend.conditional import detail_etag, list_etag
+from storage.geo import nearest_storages
+from storage.stock import BULK_STOCK_VALUES, NegativeStock, bulk_upsert_stock, get_stock, validate_stock_rows
 from catalog.models import Product
 from storage.models import Storage, ProductStorage
 from storage.serializers import StorageSerializer, ProductStorageSerializer
@@ -28,6 +33,8 @@ class StorageAPIView(APIView):
                               description='Координаты склада'),
         ]
     )
+    @list_etag(Storage)
+    @cache_response('storage')
     def get(self, request):
         """
         Получение всех складов
@@ -62,6 +69,58 @@ class StorageAPIView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class StorageNearestAPIView(APIView):
+    """Ближайшие склады с товаром"""
+
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Ближайшие к точке склады, на которых есть нужное количество товара, "
+                              "по возрастанию расстояния (км)",
+        manual_parameters=[
+            openapi.Parameter('lat', in_=openapi.IN_QUERY, type=openapi.TYPE_NUMBER,
+                              description='Широта точки (обязательный параметр)'),
+            openapi.Parameter('lon', in_=openapi.IN_QUERY, type=openapi.TYPE_NUMBER,
+                              description='Долгота точки (обязательный параметр)'),
+            openapi.Parameter('product', in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description='id товара (обязательный параметр)'),
+            openapi.Parameter('count', in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description='Необходимое количество товара (по умолчанию 1)'),
+            openapi.Parameter('limit', in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description='Количество складов (по умолчанию 5)'),
+        ]
+    )
+    @cache_response('storage', 'product_storage')
+    def get(self, request):
+        params = request.query_params
+        try:
+            latitude = float(params['lat'])
+            longitude = float(params['lon'])
+            product = int(params['product'])
+            count = int(params.get('count', 1))
+            limit = int(params.get('limit', 5))
+        except (KeyError, ValueError):
+            return Response({'error': 'Параметры lat, lon и product обязательны, count и limit - целые числа'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            return Response({'error': 'Некорректные координаты'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if count < 1 or limit < 1:
+            return Response({'error': 'count и limit должны быть больше нуля'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        rows = nearest_storages(latitude, longitude, product, count,
+                                min(limit, settings.STORAGE_NEAREST_MAX_LIMIT))
+        return Response([
+            {
+                **StorageSerializer(row.storage).data,
+                'count_product': row.count_product,
+                'distance': round(row.distance, 3),
+            }
+            for row in rows
+        ])
+
+
 class StorageAPIViewDetail(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -78,6 +137,8 @@ class StorageAPIViewDetail(APIView):
                               description='Координаты склада'),
         ]
     )
+    @detail_etag(Storage)
+    @cache_response('storage')
     def get(self, request, pk):
         """
             Получение склада по ID
@@ -152,6 +213,7 @@ class ProductStorageAPIView(APIView):
 
         ]
     )
+    @cache_response('product_storage')
     def get(self, request):
         """
         Получение информации о товарах на складе
@@ -213,6 +275,7 @@ class ProductStorageAPIViewDetail(APIView):
 
         ]
     )
+    @cache_response('product_storage')
     def get(self, request, pk):
         """
             Получение информации о товаре на складе по id в url
@@ -272,6 +335,60 @@ class ProductStorageAPIViewDetail(APIView):
         return Response("success", status=status.HTTP_204_NO_CONTENT)
 
 
+class ProductStorageBulkAPIView(APIView):
+    """Массовая загрузка остатков на складах"""
+
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Массовая запись остатков. Тело - JSON-массив объектов "
+                              "{storage, product, count_product}. Пачка записывается целиком одним запросом "
+                              "или не записывается вовсе, если в ней есть ошибки",
+        manual_parameters=[
+            openapi.Parameter('mode', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=list(BULK_STOCK_VALUES),
+                              description='set - заменить остаток (по умолчанию), '
+                                          'increment - прибавить count_product к текущему остатку; '
+                                          'если остаток стал бы отрицательным, пачка не записывается (409)'),
+        ],
+        request_body=openapi.Schema(
+            type=openapi.TYPE_ARRAY,
+            items=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    'storage': openapi.Schema(type=openapi.TYPE_INTEGER,
+                                              description='id склада'),
+                    'product': openapi.Schema(type=openapi.TYPE_INTEGER,
+                                              description='id товара'),
+                    'count_product': openapi.Schema(type=openapi.TYPE_INTEGER,
+                                                    description='Количество товара'),
+                },
+            ),
+        )
+    )
+    def post(self, request):
+        mode = request.query_params.get('mode', 'set')
+        if mode not in BULK_STOCK_VALUES:
+            return Response({'error': 'mode должен быть set или increment'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(request.data, list):
+            return Response({'error': 'Ожидается JSON-массив строк'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(request.data) > settings.STOCK_BULK_MAX_ROWS:
+            return Response({'error': f'Не более {settings.STOCK_BULK_MAX_ROWS} строк за запрос'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        totals, errors = validate_stock_rows(request.data, mode)
+        if errors:
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            written = bulk_upsert_stock(totals, mode)
+        except NegativeStock as error:
+            return Response({'error': 'Остаток не может стать отрицательным', 'errors': error.errors},
+                            status=status.HTTP_409_CONFLICT)
+        return Response({'mode': mode, 'processed': len(request.data), 'written': written})
+
+
 class ProductStorageAPIViewByStorage(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -289,6 +406,7 @@ class ProductStorageAPIViewByStorage(APIView):
 
         ]
     )
+    @cache_response('product_storage')
     def get(self, request, fk):
         """
         Получение всех складов с товарами по id склада
@@ -299,3 +417,22 @@ class ProductStorageAPIViewByStorage(APIView):
             return Response(serializer.data)
         except ProductStorage.DoesNotExist:
             return Response({"detail": "Склад не найден"}, status=status.HTTP_404_NOT_FOUND)
+
+
+class ProductStockAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Остаток товара: общее количество и разбивка по складам",
+        manual_parameters=[
+            openapi.Parameter('id', in_=openapi.IN_PATH, type=openapi.TYPE_INTEGER,
+                              description='id товара'),
+        ]
+    )
+    @cache_response('product', 'product_storage', 'storage')
+    def get(self, request, pk):
+        try:
+            product = Product.objects.only('id', 'count').get(pk=pk)
+        except Product.DoesNotExist:
+            return Response({'error': 'Товар не найден'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(get_stock(product))
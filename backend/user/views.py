@@ -5,6 +5,7 @@ from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 
+from backend.pagination import KeysetPagination, PAGINATION_PARAMETERS
 from user.models import User
 from user.serializers import UserSerializer
 
@@ -54,10 +55,16 @@ class UsersAPIView(APIView):
                               description='Фамилия пользователя'),
             openapi.Parameter('is_staff', in_=openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN,
                               description='Если значение True, пользователь является админом'),
-
+            *PAGINATION_PARAMETERS,
         ]
     )
     def get(self, request):
         users = User.objects.all()
+        paginator = KeysetPagination(ordering=('id',))
+        page = paginator.paginate_queryset(users, request)
+        if page is not None:
+            serializer = UserSerializer(page, many=True)
+            return paginator.get_paginated_response(serializer.data)
+
         serializer = UserSerializer(users, many=True)
         return Response(serializer.data)
\ No newline at end of file